@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = "refs.json"
+
+
+class AssetStore:
+    """
+    Image assets named by the SHA-256 of their bytes.
+
+    The same picture added ten times is stored once; refs.json counts how
+    many blocks point at each managed file. The manifest is only written
+    after the workspace save that matches it (see save()), and files whose
+    count dropped to zero are removed on the next start. Older
+    timestamp-named images are left alone.
+    """
+
+    def __init__(self, assets_dir, base_dir):
+        self.dir = assets_dir
+        self.base_dir = base_dir
+        self.manifest_path = os.path.join(assets_dir, MANIFEST_NAME)
+        self.refs = {}
+        self._dirty = False
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.refs = json.load(f)
+        except (OSError, ValueError):
+            self.refs = {}
+
+    def save(self):
+        """Persist the counts; called once the workspace itself is saved."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        refs = dict(self.refs)
+
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(refs, f)
+        os.replace(tmp, self.manifest_path)
+
+    def add(self, src):
+        """Copy src into the store (once) and return its workspace-relative path."""
+        ext = os.path.splitext(src)[1].lower()
+        tmp = os.path.join(self.dir, f".incoming{ext}")
+        digest = hashlib.sha256()
+
+        # hash while copying, without reading the whole file into memory
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            while True:
+                chunk = fsrc.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                fdst.write(chunk)
+
+        name = digest.hexdigest() + ext
+        dst = os.path.join(self.dir, name)
+        if os.path.exists(dst):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, dst)
+
+        self.refs[name] = self.refs.get(name, 0) + 1
+        self._dirty = True
+        return os.path.relpath(dst, self.base_dir)
+
+    def retain(self, path):
+        """Count one more block pointing at an existing managed asset."""
+        name = os.path.basename(path)
+        if name in self.refs:
+            self.refs[name] += 1
+            self._dirty = True
+
+    def release(self, path):
+        name = os.path.basename(path)
+        if self.refs.get(name, 0) > 0:
+            self.refs[name] -= 1
+            self._dirty = True
+
+    def retain_blocks(self, blocks):
+        for block in blocks:
+            if block.type == "image":
+                self.retain(block.content)
+
+    def release_blocks(self, blocks):
+        for block in blocks:
+            if block.type == "image":
+                self.release(block.content)
+
+    def recount(self, blocks):
+        """Rebuild every count from scratch, e.g. after loading a workspace."""
+        counts = dict.fromkeys(self.refs, 0)
+        for block in blocks:
+            if block.type == "image":
+                name = os.path.basename(block.content)
+                if name in counts:
+                    counts[name] += 1
+        self.refs = counts
+        self._dirty = True
+
+    def names(self):
+        """Every image in the store: managed ones and older timestamp-named ones."""
+        names = set(self.refs)
+        try:
+            names.update(os.listdir(self.dir))
+        except OSError:
+            pass
+        names.discard(MANIFEST_NAME)
+        return names
+
+    def collect_garbage(self):
+        for name, count in list(self.refs.items()):
+            if count > 0:
+                continue
+            try:
+                os.remove(os.path.join(self.dir, name))
+            except FileNotFoundError:
+                pass
+            del self.refs[name]
+            self._dirty = True
+        self.save()
@@ -0,0 +1,348 @@
+from bisect import bisect_left, bisect_right
+
+from thumbnail_cache import THUMB_SIZE
+
+
+# Blocks are built this far above and below the visible part of the canvas
+OVERSCAN = 600
+# Space between two blocks (the old pack(pady=6) on both sides)
+GAP = 12
+
+
+def estimate_height(block):
+    """Rough pixel height of a rendered block before it has been measured."""
+    lines = block.content.count("\n") + 1
+    if block.type == "code":
+        return max(4, lines) * 18 + 70 + GAP
+    if block.type == "text":
+        return (lines + len(block.content) // 100) * 20 + 60 + GAP
+    if block.type == "image":
+        return THUMB_SIZE[1] + 90 + GAP
+    if block.type == "heading":
+        return 90 + GAP
+    return 70 + GAP
+
+
+def _signature(block):
+    return (block.type, block.content)
+
+
+class BlockViewport:
+    """
+    Shows a long list of blocks on a canvas, building only the visible ones.
+
+    Every block has a height: estimated until it has been on screen, then
+    measured. Blocks are placed at the running sum of those heights, and
+    only the ones within OVERSCAN pixels of the view exist as widgets;
+    the rest are destroyed when they scroll away and built again by
+    render(index) when they come back. When a measured height differs
+    from the estimate, everything below moves and the block at the top of
+    the view stays where it is.
+
+    update(blocks) shows a changed list: built blocks are keyed by the
+    Block object and kept when their type and content are unchanged, so
+    only new, edited and removed blocks cost any widget work. When the
+    change is known, swap(), replace(), remove() and insert() skip even
+    the comparison and touch only the frames involved.
+
+    render(block, index) builds a block's frame. on_show(index, frame) is
+    called once a frame is on the canvas, on_place(index, frame, count)
+    whenever a built block may have a new index or neighbours, and
+    on_change() after any change to the list.
+    """
+
+    def __init__(self, canvas, scrollbar, blocks, render, on_show=None, on_place=None, on_change=None):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.render = render
+        self.on_show = on_show
+        self.on_place = on_place
+        self.on_change = on_change
+
+        # a copy: the file's list is changed in place before update()
+        self.blocks = list(blocks)
+        self.signatures = [_signature(block) for block in self.blocks]
+        self.heights = [estimate_height(block) for block in self.blocks]
+        self.tops = []
+        self.total = 0
+        self.shown = {}  # index -> (frame, canvas item)
+        self._ys = {}  # canvas item -> y it was placed at
+        self._pending = False
+        self._needs_layout = False
+
+        canvas.configure(yscrollcommand=self._on_scroll)
+        canvas.bind("<Configure>", self._on_resize)
+        self._place()
+        self.refresh()
+
+    # ---------------- LAYOUT ----------------
+
+    def _place(self):
+        """Recompute block positions and move the built blocks there."""
+        tops = []
+        y = 0
+        for height in self.heights:
+            tops.append(y)
+            y += height
+        self.tops = tops
+        self.total = y
+
+        width = max(1, self.canvas.winfo_width())
+        self.canvas.configure(scrollregion=(0, 0, width, max(1, y)))
+        for index, (frame, item) in self.shown.items():
+            # frames whose block did not move are left alone
+            y = tops[index] + GAP // 2
+            if self._ys.get(item) != y:
+                self._ys[item] = y
+                self.canvas.coords(item, 0, y)
+
+    def _view(self):
+        top = self.canvas.canvasy(0)
+        return top, top + max(1, self.canvas.winfo_height())
+
+    def _relayout(self):
+        # keep the block at the top of the view in place while heights change
+        top, _ = self._view()
+        anchor = max(0, bisect_right(self.tops, top) - 1)
+        offset = top - self.tops[anchor] if self.tops else 0
+
+        self._place()
+
+        if self.tops:
+            self.canvas.yview_moveto((self.tops[anchor] + offset) / max(1, self.total))
+
+    # ---------------- BUILD / DESTROY ----------------
+
+    def refresh(self):
+        """Build the blocks near the view and destroy those far from it."""
+        if not self.blocks or not self.canvas.winfo_exists():
+            return
+
+        top, bottom = self._view()
+        first = max(0, bisect_right(self.tops, top - OVERSCAN) - 1)
+        last = min(len(self.blocks), bisect_left(self.tops, bottom + OVERSCAN))
+
+        for index in [i for i in self.shown if not first <= i < last]:
+            self._hide(index)
+
+        for index in range(first, last):
+            if index not in self.shown:
+                self._show(index)
+
+    def update(self, blocks):
+        """Show blocks, a new version of the list, reusing unchanged frames."""
+        blocks = list(blocks)
+        old = {id(block): i for i, block in enumerate(self.blocks)}
+
+        # the block at the top of the view stays put if it is still there
+        top, _ = self._view()
+        anchor = max(0, bisect_right(self.tops, top) - 1)
+        offset = top - self.tops[anchor] if self.tops else 0
+        anchor_block = self.blocks[anchor] if self.blocks else None
+
+        signatures = []
+        heights = []
+        shown = {}
+        for index, block in enumerate(blocks):
+            signature = _signature(block)
+            i = old.get(id(block))
+            if i is not None and self.signatures[i] == signature:
+                heights.append(self.heights[i])
+                if i in self.shown:
+                    shown[index] = self.shown.pop(i)
+            else:
+                heights.append(estimate_height(block))
+            signatures.append(signature)
+
+        for i in list(self.shown):
+            self._hide(i)
+
+        self.blocks = blocks
+        self.signatures = signatures
+        self.heights = heights
+        self._reindex(shown)
+
+        self._place()
+        if anchor_block is not None and self.tops:
+            new = next((i for i, b in enumerate(blocks) if b is anchor_block), min(anchor, len(blocks) - 1))
+            self.canvas.yview_moveto((self.tops[new] + offset) / max(1, self.total))
+
+        self.refresh()
+        self._placed(*self.shown)
+        self._changed()
+
+    # ---------------- TARGETED CHANGES ----------------
+
+    def swap(self, i, j):
+        """Blocks i and j traded places; only their two frames move."""
+        for seq in (self.blocks, self.signatures, self.heights):
+            seq[i], seq[j] = seq[j], seq[i]
+
+        shown = dict(self.shown)
+        a, b = shown.pop(i, None), shown.pop(j, None)
+        if a is not None:
+            shown[j] = a
+        if b is not None:
+            shown[i] = b
+        self._reindex(shown)
+
+        self._place()
+        self.refresh()
+        self._placed(i, j)
+        self._changed()
+
+    def replace(self, index):
+        """Block index was edited in place; only its frame is rebuilt."""
+        self.signatures[index] = _signature(self.blocks[index])
+        # its old height stands in until the new frame is measured
+        if index in self.shown:
+            self._hide(index)
+        self.refresh()
+        self._changed()
+
+    def remove(self, index):
+        """Block index was deleted; only its frame is destroyed."""
+        top, _ = self._view()
+        height = self.heights[index]
+        above = self.tops[index] + height <= top
+
+        if index in self.shown:
+            self._hide(index)
+        for seq in (self.blocks, self.signatures, self.heights):
+            del seq[index]
+        self._reindex({
+            i - 1 if i > index else i: entry for i, entry in self.shown.items()
+        })
+
+        self._place()
+        if above:
+            # keep what is on screen where it was
+            self.canvas.yview_moveto((top - height) / max(1, self.total))
+        self.refresh()
+        self._placed(index - 1, index)
+        self._changed()
+
+    def insert(self, index, block):
+        """block was inserted at index; only its frame is built."""
+        top, _ = self._view()
+        above = index < len(self.blocks) and self.tops[index] < top
+        height = estimate_height(block)
+
+        self.blocks.insert(index, block)
+        self.signatures.insert(index, _signature(block))
+        self.heights.insert(index, height)
+        self._reindex({
+            i + 1 if i >= index else i: entry for i, entry in self.shown.items()
+        })
+
+        self._place()
+        if above:
+            self.canvas.yview_moveto((top + height) / max(1, self.total))
+        self.refresh()
+        self._placed(index - 1, index + 1)
+        self._changed()
+
+    def _reindex(self, shown):
+        self.shown = shown
+        for index, (frame, item) in shown.items():
+            frame.viewport_index = index
+
+    def _placed(self, *indexes):
+        if self.on_place is None:
+            return
+        for index in indexes:
+            shown = self.shown.get(index)
+            if shown is not None:
+                self.on_place(index, shown[0], len(self.blocks))
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def _show(self, index):
+        frame = self.render(self.blocks[index], index)
+        item = self.canvas.create_window(
+            0, self.tops[index] + GAP // 2,
+            window=frame,
+            anchor="nw",
+            width=max(1, self.canvas.winfo_width())
+        )
+        self.shown[index] = (frame, item)
+        self._ys[item] = self.tops[index] + GAP // 2
+        frame.viewport_index = index
+        frame.bind("<Configure>", lambda e, f=frame: self._measured(f, e.height))
+
+        if self.on_show is not None:
+            self.on_show(index, frame)
+        if self.on_place is not None:
+            self.on_place(index, frame, len(self.blocks))
+
+    def _hide(self, index):
+        frame, item = self.shown.pop(index)
+        self._ys.pop(item, None)
+        self.canvas.delete(item)
+        frame.destroy()
+
+    def _measured(self, frame, height):
+        index = getattr(frame, "viewport_index", None)
+        height += GAP
+        if self.shown.get(index, (None,))[0] is frame and self.heights[index] != height:
+            self.heights[index] = height
+            self._schedule(layout=True)
+
+    def _measure_shown(self):
+        changed = False
+        for index, (frame, item) in self.shown.items():
+            height = frame.winfo_reqheight() + GAP
+            if self.heights[index] != height:
+                self.heights[index] = height
+                changed = True
+        return changed
+
+    # ---------------- SCROLLING ----------------
+
+    def _schedule(self, layout=False):
+        self._needs_layout = self._needs_layout or layout
+        if not self._pending:
+            self._pending = True
+            self.canvas.after_idle(self._update)
+
+    def _update(self):
+        self._pending = False
+        if not self.canvas.winfo_exists():
+            return
+        if self._needs_layout:
+            self._needs_layout = False
+            self._relayout()
+        self.refresh()
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule()
+
+    def _on_resize(self, event):
+        for frame, item in self.shown.values():
+            self.canvas.itemconfigure(item, width=event.width)
+        self._schedule(layout=True)
+
+    def scroll_to(self, index):
+        """Bring block index to the top of the view; returns its frame."""
+        for _ in range(3):
+            # building its neighbours can change heights above index; settle
+            before = self.tops[index]
+            self.canvas.yview_moveto(before / max(1, self.total))
+            self.refresh()
+            self.canvas.update_idletasks()
+            if self._measure_shown():
+                self._place()
+            if self.tops[index] == before:
+                break
+
+        self.canvas.yview_moveto(self.tops[index] / max(1, self.total))
+        self.refresh()
+        return self.shown[index][0]
+
+    def frame(self, index):
+        """Frame of block index if it is currently built, else None."""
+        shown = self.shown.get(index)
+        return shown[0] if shown is not None else None
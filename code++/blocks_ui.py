@@ -3,8 +3,11 @@ import sys
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from ui_utils import init_placeholder
-from datetime import datetime
 from dialogs_ui import center_window, warn_required_fields
+from model import Block
+from thumbnail_cache import THUMB_SIZE
+from file_search import FileSearch
+from block_viewport import BlockViewport
 
 
 class BlockUIMixin:
@@ -12,94 +15,196 @@ class BlockUIMixin:
     # ---------------- FILE DETAIL / BLOCKS ----------------
 
     def render_file_detail(self):
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        file = self.workspace.folders[self.current_folder].files[self.current_file]
+        blocks = file.blocks
 
-        file_data = self.data["folders"][self.current_folder]["files"][self.current_file]
+        screen, fresh = self.show_screen(
+            ("file", self.current_folder, self.current_file, bool(blocks))
+        )
 
-        header = ttk.Frame(self.content_frame)
-        header.pack(fill="x", pady=(0, 10))
+        if fresh:
+            header = ttk.Frame(screen)
+            header.pack(fill="x", pady=(0, 10))
 
-        ttk.Button(header, text="← Back", command=self.render_file_list).pack(side="left")
+            ttk.Button(header, text="← Back", command=self.render_file_list).pack(side="left")
 
-        ttk.Label(
-            header,
-            text=self.current_file,
-            font=("Segoe UI", 16, "bold")
-        ).pack(side="left", padx=10)
+            ttk.Label(
+                header,
+                text=self.current_file,
+                font=("Segoe UI", 16, "bold")
+            ).pack(side="left", padx=10)
 
-        ttk.Button(header, text="Add Content", command=self.add_content_popup).pack(side="right")
+            ttk.Button(header, text="Add Content", command=self.add_content_popup).pack(side="right")
 
         # -------- BLOCKS --------
-        self.block_widgets = []
-        blocks = file_data.get("blocks", [])
-
         if not blocks:
-            empty_frame = ttk.Frame(self.content_frame)
-            empty_frame.pack(fill="both", pady=20)
-
-            ttk.Label(
-                empty_frame,
-                text="No content yet. Add some blocks.",
-                foreground="gray",
-                font=("Segoe UI", 12)
-            ).pack(expand=True)
+            self.block_view = None
+            if fresh:
+                empty_frame = ttk.Frame(screen)
+                empty_frame.pack(fill="both", pady=20)
+
+                ttk.Label(
+                    empty_frame,
+                    text="No content yet. Add some blocks.",
+                    foreground="gray",
+                    font=("Segoe UI", 12)
+                ).pack(expand=True)
 
             return
 
-
-
+        if fresh:
+            self.images.new_generation()
+            self.build_block_area(screen, blocks)
+        else:
+            if screen.restored:
+                # images still loading when the screen was left were cancelled
+                self.images.new_generation()
+                for frame, _ in list(screen.block_view.shown.values()):
+                    if frame.load_image is not None:
+                        frame.load_image()
+            # same file still showing: only changed blocks are rebuilt
+            screen.block_view.update(blocks)
+
+        self.block_view = screen.block_view
+
+    def build_block_area(self, screen, blocks):
         # -------- SEARCH BAR (always visible) --------
+        search_bar = ttk.Frame(screen)
+        search_bar.pack(fill="x", padx=5, pady=5)
+
         search_var = tk.StringVar()
-        search_entry = ttk.Entry(self.content_frame, textvariable=search_var)
-        search_entry.pack(fill="x", padx=5, pady=5)
+        count_var = tk.StringVar()
+        ttk.Label(search_bar, textvariable=count_var, foreground="gray").pack(side="right", padx=(8, 0))
+        search_entry = ttk.Entry(search_bar, textvariable=search_var)
+        search_entry.pack(fill="x")
         init_placeholder(search_entry, "Search in this file...")
 
         # -------- SCROLL AREA (always exists) --------
-        canvas = tk.Canvas(self.content_frame)
-        scrollbar = ttk.Scrollbar(self.content_frame, orient="vertical", command=canvas.yview)
-        scroll_frame = ttk.Frame(canvas)
-
-        scroll_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        # only blocks near the view exist as widgets; see BlockViewport
+        canvas = tk.Canvas(screen)
+        scrollbar = ttk.Scrollbar(screen, orient="vertical", command=canvas.yview)
 
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
+        # -------- BLOCK SEARCH + HIGHLIGHT --------
+        # one buffer per version of the block list, built when first needed;
+        # typing narrows it, Enter / Shift+Enter cycle
+        screen.finder = None
+
+        def current_finder():
+            if screen.finder is None:
+                screen.finder = FileSearch([b.content for b in screen.block_view.blocks])
+            return screen.finder
+
+        def paint(index, frame):
+            finder = current_finder()
+            found = finder.match()
+            current = found is not None and found[0] == index
+            frame.configure(style="Highlight.TFrame" if current else "TFrame")
+
+            txt = frame.code_view
+            if txt is None:
+                return
 
-        for index, block in enumerate(blocks):
-            self.render_block(scroll_frame, block, index)
+            txt.tag_remove("search_match", "1.0", "end")
+            txt.tag_remove("search_current", "1.0", "end")
+            for _, start, end in finder.matches_in(index):
+                txt.tag_add("search_match", f"1.0 + {start} chars", f"1.0 + {end} chars")
+
+            if current:
+                first, last = f"1.0 + {found[1]} chars", f"1.0 + {found[2]} chars"
+                txt.tag_add("search_current", first, last)
+                txt.see(first)
+
+        def on_show(index, frame):
+            txt = frame.code_view
+            if txt is not None:
+                txt.tag_configure("search_match", background="#515c6a")
+                txt.tag_configure("search_current", background="#d7ba7d", foreground="#1e1e1e")
+                txt.tag_raise("search_current")
+            if screen.finder is not None and screen.finder.query:
+                paint(index, frame)
+
+        def on_place(index, frame, count):
+            btn_up, btn_down = frame.move_buttons
+            btn_up.state(["disabled" if index == 0 else "!disabled"])
+            btn_down.state(["disabled" if index == count - 1 else "!disabled"])
+
+        screen.block_view = BlockViewport(
+            canvas,
+            scrollbar,
+            blocks,
+            lambda block, i: self.render_block(canvas, block, i),
+            on_show,
+            on_place,
+            lambda: blocks_changed()
+        )
 
-        # -------- BLOCK SEARCH + HIGHLIGHT --------
-        def search_in_file(*args):
-            query = search_var.get().strip().lower()
-            if not query:
+        def show_count():
+            finder = current_finder()
+            if finder.match() is None:
+                count_var.set("No matches" if finder.query else "")
+            else:
+                count_var.set(f"{finder.current + 1} / {len(finder.positions)}")
+
+        def show_current():
+            if screen.finder is None:
+                return
+            show_count()
+            found = current_finder().match()
+            if found is not None:
+                index = found[0]
+                paint(index, screen.block_view.scroll_to(index))
+
+        def find_again():
+            # also after edits: repaint what is built, but don't scroll
+            query = search_var.get().strip()
+            if query == search_entry.placeholder:
+                query = ""
+
+            if not query and (screen.finder is None or not screen.finder.query):
+                # nothing searched before or now; skip building the buffer
+                count_var.set("")
                 return
 
-            for frame, text in self.block_widgets:
-                if query in text:
-                    canvas.update_idletasks()
-                    canvas_height = max(1, scroll_frame.winfo_height())
-                    canvas.yview_moveto(frame.winfo_y() / canvas_height)
-                    frame.configure(style="Highlight.TFrame")
-                    self.after(1500, lambda f=frame: f.configure(style="TFrame"))
-                    break
+            current_finder().find(query)
+            for index, (frame, _) in list(screen.block_view.shown.items()):
+                paint(index, frame)
+            show_count()
 
-        search_var.trace_add("write", search_in_file)
+        def search_in_file(*args):
+            find_again()
+            show_current()
+
+        def step(direction):
+            finder = current_finder()
+            before = finder.match()
+            if direction > 0:
+                finder.next()
+            else:
+                finder.previous()
 
+            if before is not None:
+                frame = screen.block_view.frame(before[0])
+                if frame is not None:
+                    paint(before[0], frame)
+            show_current()
+            return "break"
 
+        def blocks_changed():
+            screen.finder = None
+            find_again()
 
+        search_var.trace_add("write", search_in_file)
+        search_entry.bind("<Return>", lambda e: step(1))
+        search_entry.bind("<Shift-Return>", lambda e: step(-1))
 
     # ---------------- SINGLE BLOCK ----------------
 
     def render_block(self, parent, block, index):
+        """Build the widgets of one block; the caller places the returned frame."""
         frame = ttk.Frame(parent, padding=10, relief="ridge")
-        frame.pack(fill="x", pady=6)
 
         header_frame = ttk.Frame(frame)
         header_frame.pack(fill="x")
@@ -111,14 +216,12 @@ class BlockUIMixin:
         ).pack(side="left", fill="x", expand=True)
 
 
-        file_blocks = self.data["folders"][self.current_folder]["files"][self.current_file]["blocks"]
-
         # Move Up
         btn_up = ttk.Button(
             header_frame,
             text="↑",
             width=3,
-            command=lambda i=index: self.move_block(i, -1)
+            command=lambda b=block: self.move_block(b, -1)
         )
         btn_up.pack(side="right", padx=2)
 
@@ -127,16 +230,14 @@ class BlockUIMixin:
             header_frame,
             text="↓",
             width=3,
-            command=lambda i=index: self.move_block(i, 1)
+            command=lambda b=block: self.move_block(b, 1)
         )
         btn_down.pack(side="right", padx=2)
 
-        # Disable buttons when needed
-        if index == 0:
-            btn_up.state(["disabled"])
-
-        if index == len(file_blocks) - 1:
-            btn_down.state(["disabled"])
+        # the viewport enables / disables them as the block moves
+        frame.move_buttons = (btn_up, btn_down)
+        frame.code_view = None
+        frame.load_image = None
 
 
         ttk.Button(
@@ -155,8 +256,8 @@ class BlockUIMixin:
 
         content_text = ""
 
-        if block["type"] == "heading":
-            content_text = block["content"]
+        if block.type == "heading":
+            content_text = block.content
             ttk.Label(
                 frame,
                 text=content_text,
@@ -164,8 +265,8 @@ class BlockUIMixin:
             ).pack(anchor="w", pady=(2, 6))
 
 
-        if block["type"] == "text":
-            content_text = block["content"]
+        if block.type == "text":
+            content_text = block.content
             content_label = ttk.Label(
                 frame,
                 text=content_text,
@@ -176,8 +277,8 @@ class BlockUIMixin:
             content_label.pack(fill="x", anchor="w", pady=(4, 0))
 
 
-        elif block["type"] == "code":
-            content_text = block["content"]
+        elif block.type == "code":
+            content_text = block.content
             txt = tk.Text(
                 frame,
                 height=max(4, content_text.count("\n") + 1),
@@ -192,9 +293,10 @@ class BlockUIMixin:
             txt.insert("1.0", content_text)
             txt.config(font=("Consolas", 11))
             txt.pack(fill="x", padx=2, pady=(10, 0))
+            frame.code_view = txt
 
-        elif block["type"] == "link":
-            content_text = block["content"]
+        elif block.type == "link":
+            content_text = block.content
 
             lbl = ttk.Label(
                 frame,
@@ -219,7 +321,7 @@ class BlockUIMixin:
             lbl.bind("<Button-1>", open_link)
 
 
-        elif block["type"] == "image":
+        elif block.type == "image":
             # 🔹 Small info note (very subtle)
             ttk.Label(
                 frame,
@@ -228,18 +330,17 @@ class BlockUIMixin:
                 foreground="#6b4e31"
             ).pack(anchor="w", pady=(0, 4))
 
-            img_path = os.path.join(os.path.dirname(self.data_path), block["content"])
+            img_path = os.path.join(os.path.dirname(self.data_path), block.content)
             try:
-                from PIL import Image, ImageTk
-                img = Image.open(img_path)
-                img.thumbnail((500, 300))
-                photo = ImageTk.PhotoImage(img)
-
-                lbl = ttk.Label(frame, image=photo)
-                lbl.image = photo  # keep reference
-                lbl.pack(anchor="w")
+                key = self.thumbnails.key(img_path)
+                photo = self.thumbnails.cached_photo(key)
 
-                content_text = block["content"]
+                if photo is not None:
+                    lbl = ttk.Label(frame, image=photo)
+                    lbl.image = photo  # keep reference
+                    lbl.pack(anchor="w")
+                else:
+                    self.render_image_placeholder(frame, img_path, key)
 
             except Exception:
                 content_text = "[Image not found]"
@@ -256,16 +357,55 @@ class BlockUIMixin:
                 txt.pack(anchor="w")
 
 
-        self.block_widgets.append(
-            (frame, (content_text).lower())
-        )
+        return frame
+
+    def render_image_placeholder(self, frame, img_path, key):
+        """Reserve the thumbnail's space now; the image is decoded in the background."""
+        holder = tk.Frame(frame, width=THUMB_SIZE[0], height=THUMB_SIZE[1], bg="#eeeeee")
+        holder.pack_propagate(False)
+        holder.pack(anchor="w")
+        ttk.Label(holder, text="Loading image…", foreground="gray").pack(expand=True)
+
+        def show(photo):
+            if not holder.winfo_exists():
+                return
+            frame.load_image = None
+            for widget in holder.winfo_children():
+                widget.destroy()
+            holder.configure(width=photo.width(), height=photo.height())
+            lbl = ttk.Label(holder, image=photo)
+            lbl.image = photo  # keep reference
+            lbl.pack()
+
+        def failed():
+            if not holder.winfo_exists():
+                return
+            frame.load_image = None
+            for widget in holder.winfo_children():
+                widget.destroy()
+            tk.Label(holder, text="[Image not found]", fg="red").pack(anchor="w")
+
+        # kept until the image arrives, to ask again if this screen is
+        # cached and its request cancelled meanwhile
+        frame.load_image = lambda: self.images.request(img_path, key, show, failed)
+        frame.load_image()
 
     # ---------------- BLOCK ACTIONS ----------------
 
-    def move_block(self, index, direction):
-        file_data = self.data["folders"][self.current_folder]["files"][self.current_file]
-        blocks = file_data.get("blocks", [])
+    def _blocks_path(self):
+        return ["folders", self.current_folder, "files", self.current_file, "blocks"]
 
+    def _showing_blocks(self):
+        """The block viewport of the open file, if it is on screen."""
+        view = self.block_view
+        if view is not None and view.canvas.master is self._screen:
+            return view
+        return None
+
+    def move_block(self, block, direction):
+        blocks = self.workspace.folders[self.current_folder].files[self.current_file].blocks
+
+        index = blocks.index(block)
         new_index = index + direction
 
         if new_index < 0 or new_index >= len(blocks):
@@ -274,19 +414,33 @@ class BlockUIMixin:
         # Swap blocks
         blocks[index], blocks[new_index] = blocks[new_index], blocks[index]
 
-        self.save_data()
-        self.render_file_detail()
+        path = self._blocks_path()
+        self.save_data(("set", path + [index]), ("set", path + [new_index]))
+
+        view = self._showing_blocks()
+        if view is not None:
+            view.swap(index, new_index)
+        else:
+            self.render_file_detail()
 
 
     def delete_block(self, block):
         if not messagebox.askyesno("Delete Block", "Delete this block permanently?"):
             return
 
-        file_data = self.data["folders"][self.current_folder]["files"][self.current_file]
-        file_data["blocks"].remove(block)
+        blocks = self.workspace.folders[self.current_folder].files[self.current_file].blocks
+        index = blocks.index(block)
+        del blocks[index]
+        self.assets.release_blocks([block])
+
+        self.save_data(("delete", self._blocks_path() + [index]))
 
-        self.save_data()
-        self.render_file_detail()
+        view = self._showing_blocks()
+        if view is not None and blocks:
+            view.remove(index)
+        else:
+            # the last block is gone: show the empty file screen
+            self.render_file_detail()
 
     def edit_block_popup(self, block):
         popup = tk.Toplevel(self)
@@ -297,7 +451,7 @@ class BlockUIMixin:
         popup.grab_set()
 
         ttk.Label(popup, text="Type").pack(pady=5)
-        type_var = tk.StringVar(value=block["type"].title())
+        type_var = tk.StringVar(value=block.type.title())
         ttk.Combobox(
             popup,
             textvariable=type_var,
@@ -311,8 +465,8 @@ class BlockUIMixin:
 
         image_path_var = tk.StringVar()
 
-        if block["type"] != "image":
-            content_box.insert("1.0", block["content"])
+        if block.type != "image":
+            content_box.insert("1.0", block.content)
 
         def choose_image():
             path = filedialog.askopenfilename(
@@ -329,23 +483,34 @@ class BlockUIMixin:
             if block_type == "image":
                 src = image_path_var.get()
                 if src:
-                    ext = os.path.splitext(src)[1]
-                    filename = f"{int(datetime.now().timestamp())}{ext}"
-                    dst = os.path.join(self.assets_dir, filename)
-                    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
-                        fdst.write(fsrc.read())
-                    block["content"] = os.path.relpath(dst, os.path.dirname(self.data_path))
+                    # the new image first: if copying it fails, the block
+                    # still holds (and counts) the old one
+                    try:
+                        content = self.assets.add(src)
+                    except OSError as e:
+                        messagebox.showerror("Image Error", str(e))
+                        return
+                    self.assets.release_blocks([block])
+                    block.content = content
             else:
                 content = content_box.get("1.0", "end").strip()
                 if not content:
                     warn_required_fields()
                     return
-                block["content"] = content
-            block["type"] = block_type
+                self.assets.release_blocks([block])
+                block.content = content
+            block.type = block_type
 
-            self.save_data()
+            blocks = self.workspace.folders[self.current_folder].files[self.current_file].blocks
+            index = blocks.index(block)
+            self.save_data(("set", self._blocks_path() + [index]))
             popup.destroy()
-            self.render_file_detail()
+
+            view = self._showing_blocks()
+            if view is not None:
+                view.replace(index)
+            else:
+                self.render_file_detail()
 
         ttk.Button(popup, text="Save", command=save).pack(pady=10)
 
@@ -385,7 +550,7 @@ class BlockUIMixin:
 
         def add():
             block_type = type_var.get().lower()
-            file_data = self.data["folders"][self.current_folder]["files"][self.current_file]
+            blocks = self.workspace.folders[self.current_folder].files[self.current_file].blocks
 
             if block_type == "image":
                 src = image_path_var.get()
@@ -393,30 +558,24 @@ class BlockUIMixin:
                     warn_required_fields()
                     return
 
-                ext = os.path.splitext(src)[1]
-                filename = f"{int(datetime.now().timestamp())}{ext}"
-                dst = os.path.join(self.assets_dir, filename)
-
-                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
-                    fdst.write(fsrc.read())
-
-                content = os.path.relpath(dst, os.path.dirname(self.data_path))
+                content = self.assets.add(src)
             else:
                 content = content_box.get("1.0", "end").strip()
                 if not content:
                     warn_required_fields()
                     return
 
-            if "blocks" not in file_data:
-                file_data["blocks"] = []
-
-            file_data["blocks"].append({
-                "type": block_type,
-                "content": content
-            })
+            block = Block(block_type, content)
+            blocks.append(block)
 
-            self.save_data()
+            self.save_data(("set", self._blocks_path() + [len(blocks) - 1]))
             popup.destroy()
-            self.render_file_detail()
+
+            view = self._showing_blocks()
+            if view is not None:
+                view.insert(len(blocks) - 1, block)
+                view.scroll_to(len(blocks) - 1)
+            else:
+                self.render_file_detail()
 
         ttk.Button(popup, text="Add", command=add).pack(pady=10)
@@ -0,0 +1,49 @@
+import re
+
+
+# Whitespace-separated chunks are kept whole ("std::vector<int>",
+# "kube-system", "--dry-run=client") and also broken into the pieces a
+# programmer would search for.
+_CHUNK = re.compile(r"\S+")
+_FLAG = re.compile(r"--?[A-Za-z][\w-]*")
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_OPERATOR = re.compile(r"::|->|=>|==|!=|<=|>=|&&|\|\||[<>=!&|*+%^~@$#]")
+# camelCase / PascalCase / HTTPServer / v2 humps
+_HUMP = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+_BRACKETS = "()[]{}'\"`"
+_TRAILING = ";,:."
+
+
+def code_tokens(text):
+    """
+    Lowercase search tokens of a code block, repeats included.
+
+    "getUserById" gives getuserbyid, get, user, by, id; "snake_case_names"
+    gives the whole name and snake, case, names; paths are split on / and
+    \\, flags keep their dashes (-n, --namespace), and operators such as
+    :: -> => are tokens of their own.
+    """
+    tokens = []
+
+    for chunk in _CHUNK.findall(text):
+        whole = chunk.strip(_BRACKETS).rstrip(_TRAILING) or chunk
+        tokens.append(whole.lower())
+
+        flag = _FLAG.match(whole)
+        if flag and flag.group() != whole:
+            tokens.append(flag.group().lower())
+
+        for identifier in _IDENTIFIER.findall(whole):
+            lower = identifier.lower()
+            if identifier != whole:
+                tokens.append(lower)
+
+            words = [w for w in identifier.split("_") if w]
+            parts = [p.lower() for w in words for p in _HUMP.findall(w)]
+            if len(parts) > 1 or (parts and parts[0] != lower):
+                tokens.extend(parts)
+
+        tokens.extend(op for op in _OPERATOR.findall(whole) if op != whole)
+
+    return tokens
@@ -0,0 +1,188 @@
+import json
+import os
+import struct
+import zlib
+
+from model import Children, Folder, Workspace, json_default, plain
+
+
+# v2 container:  MAGIC | header length (4 bytes) | JSON header | zlib chunks
+# v1 files are plain (pretty-printed) JSON and are still read as before.
+MAGIC = b"CODEPP\x00\x02"
+FORMAT_VERSION = "2.0"
+# level 1 already shrinks note JSON several times and is ~4x faster than 6
+COMPRESS_LEVEL = 1
+
+_HEADER_LEN = struct.Struct(">I")
+
+
+def _encode(value):
+    raw = json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), default=json_default
+    )
+    return zlib.compress(raw.encode("utf-8"), COMPRESS_LEVEL)
+
+
+def _write_container(path, header, chunks):
+    raw_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(raw_header)))
+        f.write(raw_header)
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _v2_meta(meta=None):
+    meta = dict(meta or {"app": "Code++"})
+    meta["version"] = FORMAT_VERSION
+    return meta
+
+
+# ---------------- WRITE ----------------
+
+def write_workspace(path, data):
+    """
+    Write a whole workspace (a Workspace or its plain JSON form) with one
+    compressed chunk per folder.
+
+    The header lists every folder with its attributes, file count and
+    chunk position, so a reader can show the folder screen and decode
+    single folders without touching the rest.
+    """
+    if isinstance(data, Workspace):
+        data = {"meta": data.meta, "folders": data.folders}
+
+    folders = []
+    chunks = []
+    offset = 0
+
+    for name, folder in data.get("folders", {}).items():
+        # one folder at a time, so a Workspace is never copied whole
+        folder = plain(folder)
+        chunk = _encode(folder)
+        folders.append([name, {
+            "attrs": {k: v for k, v in folder.items() if k != "files"},
+            "file_count": len(folder.get("files", {})),
+            "offset": offset,
+            "length": len(chunk)
+        }])
+        chunks.append(chunk)
+        offset += len(chunk)
+
+    header = {
+        "meta": _v2_meta(data.get("meta")),
+        "type": "workspace",
+        "folders": folders
+    }
+    _write_container(path, header, chunks)
+
+
+def write_export(path, kind, name, data):
+    """Write a shared folder or file as a single compressed chunk."""
+    chunk = _encode({"type": kind, "name": name, "data": data})
+    header = {
+        "meta": _v2_meta(),
+        "type": kind,
+        "name": name,
+        "offset": 0,
+        "length": len(chunk)
+    }
+    _write_container(path, header, [chunk])
+
+
+# ---------------- READ ----------------
+
+def read_header(path):
+    """Return (header, payload_start) for a v2 file, None for legacy JSON."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        (length,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + _HEADER_LEN.size + length
+
+
+def header_checksum(path):
+    """CRC32 of a v2 file's header alone (meta and folder table); None for v1."""
+    with open(path, "rb") as f:
+        raw = f.read(len(MAGIC) + _HEADER_LEN.size)
+        if raw[:len(MAGIC)] != MAGIC:
+            return None
+        (length,) = _HEADER_LEN.unpack(raw[len(MAGIC):])
+        return zlib.crc32(f.read(length), zlib.crc32(raw))
+
+
+def read_chunk(path, start, entry):
+    with open(path, "rb") as f:
+        f.seek(start + entry["offset"])
+        raw = f.read(entry["length"])
+    return json.loads(zlib.decompress(raw))
+
+
+def read(path):
+    """Read any .codepp file (v1 JSON or v2) into its plain JSON form."""
+    found = read_header(path)
+    if found is None:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    header, start = found
+    if header.get("type") != "workspace":
+        return read_chunk(path, start, header)
+
+    return {
+        "meta": header["meta"],
+        "folders": {
+            name: read_chunk(path, start, entry)
+            for name, entry in header["folders"]
+        }
+    }
+
+
+def load_lazy(path):
+    """
+    Build a v2 Workspace from its header alone.
+
+    Folders load lazily: a folder's chunk is decompressed and parsed the
+    first time it is opened. Returns None for legacy v1 files.
+    """
+    found = read_header(path)
+    if found is None or found[0].get("type") != "workspace":
+        return None
+    header, start = found
+
+    def load_folder(name, summary):
+        return read_folder(path, summary)
+
+    summaries = {
+        name: {
+            "created": entry["attrs"].get("created", ""),
+            "file_count": entry["file_count"],
+            "start": start,
+            "entry": entry
+        }
+        for name, entry in header["folders"]
+    }
+    return Workspace(header["meta"], Children(Folder, summaries, load_folder))
+
+
+def read_folder(path, summary):
+    """Decode one folder of a lazy Workspace from its summary (any thread)."""
+    return Folder.from_dict(read_chunk(path, summary["start"], summary["entry"]))
+
+
+def read_folders(path, names):
+    """
+    Yield (name, Folder) for the named folders of a v2 file, decoded
+    straight from its chunks, apart from any lazily loaded Workspace.
+    """
+    header, start = read_header(path)
+    entries = dict(header["folders"])
+    for name in names:
+        yield name, Folder.from_dict(read_chunk(path, start, entries[name]))
@@ -1,25 +1,39 @@
-import json
 import os
+import threading
+import time
 from datetime import datetime
 from tkinter import messagebox
 
+from journal import Journal, encode_change
+import codepp_format
+from save_scheduler import SaveScheduler
+from sqlite_store import SqliteStore
+from model import Folder, Workspace, plain
+from search_index import SearchIndex
+from workspace_reader import WorkspaceReader
+
 APP_NAME = "Code++"
 DEFAULT_DIR = os.path.join(os.path.expanduser("~"), "Documents", "Code++")
 DEFAULT_FILE = os.path.join(DEFAULT_DIR, "Code++_Data.codepp")
 
+DEFAULT_DB = os.path.join(DEFAULT_DIR, "Code++_Data.db")
 
-class DataManagerMixin:
+# Append each edit to a small log instead of rewriting the whole workspace
+USE_JOURNAL = True
 
-    @staticmethod
-    def _get_created(obj, default="1970-01-01T00:00:00"):
-        created = obj.get("created", default)
-        try:
-            return datetime.fromisoformat(created)
-        except Exception:
-            try:
-                return datetime.fromisoformat(default)
-            except Exception:
-                return datetime.min
+# "json" keeps the .codepp workspace, "sqlite" moves it into DEFAULT_DB
+# (migrated once from the existing .codepp on first start)
+STORAGE_BACKEND = os.environ.get("CODEPP_STORAGE", "json")
+
+# search index sidecar, next to the workspace file
+INDEX_SUFFIX = ".index"
+# the sidecar is rewritten after a save at most this often (seconds)
+INDEX_SAVE_INTERVAL = 30
+# on exit, give up on the sidecar if the index stays busy this long
+INDEX_EXIT_TIMEOUT = 2
+
+
+class DataManagerMixin:
 
     def ensure_default_file(self):
         os.makedirs(DEFAULT_DIR, exist_ok=True)
@@ -35,38 +49,292 @@ class DataManagerMixin:
                 },
                 "folders": {}
             }
-            with open(DEFAULT_FILE, "w", encoding="utf-8") as f:
-                json.dump(default_data, f, indent=4)
+            codepp_format.write_workspace(DEFAULT_FILE, default_data)
 
-    def load_data(self, path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                self.data = json.load(f)
+    def _read_json_workspace(self, path):
+        journal = Journal(path) if USE_JOURNAL else None
+        data = None
+
+        if journal is not None:
+            journal.promote()
+            # only the v2 header is read; folders load when opened
+            data = codepp_format.load_lazy(path)
+
+        if data is None:
+            # legacy v1 JSON: parse it all and rewrite it as v2
+            data = codepp_format.read(path)
+            self._needs_reindex = journal is not None
 
-            if "meta" not in self.data:
+            if "meta" not in data:
                 now = datetime.now().isoformat()
-                self.data["meta"] = {
+                data["meta"] = {
                     "app": APP_NAME,
                     "version": "1.0",
                     "created": now,
                     "last_modified": now
                 }
-            if "folders" not in self.data:
-                self.data["folders"] = {}
+            data = Workspace.from_dict(data)
+
+        if journal is not None:
+            journal.replay(data)
+        return data, journal
+
+    def load_data(self, path):
+        try:
+            self.store = None
+            self.journal = None
+            self._needs_reindex = False
+
+            if STORAGE_BACKEND == "sqlite":
+                self.store = SqliteStore(DEFAULT_DB)
+                if self.store.is_empty():
+                    # one-shot migration of the existing .codepp workspace
+                    data, _ = self._read_json_workspace(path)
+                    self.store.replace_all(data)
+                self.workspace = self.store.load()
+                path = DEFAULT_DB
+                # search workers read unopened folders through their own connection
+                self.reader = WorkspaceReader(
+                    lambda: self.workspace, self.store.read_folder, self.store.read_file
+                )
+            else:
+                self.workspace, self.journal = self._read_json_workspace(path)
+                data_path = path
+                self.reader = WorkspaceReader(
+                    lambda: self.workspace,
+                    lambda name, summary: codepp_format.read_folder(data_path, summary)
+                )
 
             self.data_path = path
+            self._index_saved_at = 0.0
+            self._index_timer = None
+            self.search_index = SearchIndex()
+            if not self.search_index.load(
+                path + INDEX_SUFFIX, self.reader, self._index_fingerprint()
+            ):
+                self.warm_search_index()
+            if getattr(self, "saver", None) is None:
+                self.saver = SaveScheduler(
+                    self._write_pending,
+                    on_error=self._report_save_error
+                )
+
+            if self._needs_reindex and self.store is None:
+                self.saver.mark_dirty(full=self._snapshot())
+
             if self.status_var is not None:
                 self.update_status()
 
         except Exception as e:
             messagebox.showerror("Load Error", str(e))
 
-    def save_data(self):
+    def save_data(self, *changes):
+        """
+        Mark the workspace dirty after a mutation of self.workspace.
+
+        changes describe what was touched as a path into the model, e.g.
+        ("set", ["folders", name]), ("set", [..., "blocks", index]),
+        ("delete", path) or ("rename", path, new_key). With the journal
+        enabled only those records are written (or, with the SQLite
+        backend, only the rows they name); without changes (or without
+        the journal) the whole workspace is written out from a copy
+        taken here. The actual write happens shortly after on the save
+        worker.
+        """
         try:
-            if "meta" not in self.data:
-                self.data["meta"] = {}
-            self.data["meta"]["last_modified"] = datetime.now().isoformat()
-            with open(self.data_path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=4)
+            self.workspace.meta["last_modified"] = datetime.now().isoformat()
+
+            # marked dirty before the index hears of it, so an index that
+            # has caught up with an edit is never saved as matching the disk
+            journal = getattr(self, "journal", None)
+            store = getattr(self, "store", None)
+            if changes and (journal is not None or store is not None):
+                records = changes + (("set", ["meta", "last_modified"]),)
+                if journal is not None:
+                    lines = journal.encode(self.workspace, records)
+                else:
+                    lines = [encode_change(self.workspace, 0, c) for c in records]
+                self.saver.mark_dirty(lines)
+            else:
+                self.saver.mark_dirty(full=self._snapshot())
+
+            if changes:
+                self.search_index.apply(changes)
+            else:
+                self.search_index.reset()
+
+            # cached screens showing what changed must not come back
+            screens = getattr(self, "screens", None)
+            if screens is not None:
+                if changes:
+                    screens.invalidate(changes)
+                else:
+                    screens.clear()
         except Exception as e:
             messagebox.showerror("Save Error", str(e))
+
+    def _snapshot(self):
+        """(plain copy of the workspace, journal seq) for a full write."""
+        journal = getattr(self, "journal", None)
+        if journal is not None:
+            return journal.snapshot(self.workspace)
+        return plain(self.workspace), None
+
+    # ---------------- SEARCH INDEX SIDECAR ----------------
+
+    def _index_fingerprint(self):
+        """
+        What the data on disk looks like, cheap to take on every save: the
+        SQLite meta.last_modified, or the CRC of the small v2 header
+        (meta with last_modified and journal_seq, folder table) plus size
+        and mtime of the data file and its journal.
+        """
+        store = getattr(self, "store", None)
+        if store is not None:
+            return {"last_modified": store.last_modified()}
+
+        paths = [self.data_path]
+        journal = getattr(self, "journal", None)
+        if journal is not None:
+            paths += [journal.path, journal.compacting_path]
+
+        files = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                files.append(None)
+                continue
+            files.append([st.st_size, st.st_mtime_ns])
+
+        return {
+            "header": codepp_format.header_checksum(self.data_path),
+            "files": files
+        }
+
+    def _settled_fingerprint(self):
+        # edits still waiting to be written leave the disk behind the index
+        if self.saver.pending():
+            return None
+        return self._index_fingerprint()
+
+    def warm_search_index(self):
+        """
+        (Re)build the search index in the background, before the first
+        query. Folders already open are copied here; the others are read
+        from the data file (or database) by the worker, so none of them
+        gets loaded into the workspace for it.
+        """
+        folders = self.workspace.folders
+        order = list(folders)
+        copies = {}
+        unread = []
+        for name in order:
+            if folders.is_loaded(name):
+                copies[name] = Folder.from_dict(plain(folders[name]))
+            else:
+                unread.append((name, folders.summary(name)))
+
+        store = getattr(self, "store", None)
+        if store is not None:
+            read = store.read_folders(unread)
+        else:
+            read = codepp_format.read_folders(self.data_path, [name for name, _ in unread])
+
+        def sources():
+            for name in order:
+                yield (name, copies[name]) if name in copies else next(read)
+
+        self.search_index.load_from(sources())
+        threading.Thread(
+            target=self.search_index.warm,
+            args=(self.reader,),
+            daemon=True
+        ).start()
+
+    def save_search_index(self):
+        """Called on exit, after flush_saves(), so the fingerprint is final."""
+        index = getattr(self, "search_index", None)
+        if index is None or not index.built:
+            return
+        try:
+            # a search still running must not hold up the exit
+            index.save(
+                self.data_path + INDEX_SUFFIX,
+                self.reader,
+                self._settled_fingerprint,
+                timeout=INDEX_EXIT_TIMEOUT
+            )
+        except Exception:
+            # only a cache; the next start rebuilds it
+            pass
+
+    def flush_saves(self):
+        saver = getattr(self, "saver", None)
+        if saver is not None:
+            saver.close()
+
+    # -------- runs on the save worker thread --------
+
+    def _write_pending(self, lines, full):
+        # full is a snapshot; the live workspace is never read from here
+        journal = getattr(self, "journal", None)
+        store = getattr(self, "store", None)
+
+        if full is not None:
+            data, seq = full
+            if store is not None:
+                store.replace_all(data)
+            elif journal is not None:
+                journal.write_full(data, seq)
+            else:
+                codepp_format.write_workspace(self.data_path, data)
+
+        if lines:
+            if store is not None:
+                store.apply(lines)
+            else:
+                journal.append(lines)
+
+        # image refcounts never get ahead of the edits that changed them
+        assets = getattr(self, "assets", None)
+        if assets is not None:
+            assets.save()
+
+        self._autosave_search_index()
+
+    def _autosave_search_index(self):
+        """Keep the sidecar matching what was just written, now and then."""
+        index = getattr(self, "search_index", None)
+        if index is None or not index.built or not index.unsaved:
+            return
+
+        wait = self._index_saved_at + INDEX_SAVE_INTERVAL - time.monotonic()
+        if wait <= 0:
+            try:
+                # never wait for a search or warm-up; the timer retries
+                if index.save(
+                    self.data_path + INDEX_SUFFIX,
+                    self.reader,
+                    self._settled_fingerprint,
+                    timeout=0
+                ):
+                    self._index_saved_at = time.monotonic()
+            except Exception:
+                pass
+            if not index.unsaved:
+                return
+            wait = INDEX_SAVE_INTERVAL
+
+        if self._index_timer is None:
+            self._index_timer = threading.Timer(wait, self._index_save_due)
+            self._index_timer.daemon = True
+            self._index_timer.start()
+
+    def _index_save_due(self):
+        # an empty save pass: nothing to write, but the sidecar gets its turn
+        self._index_timer = None
+        self.saver.mark_dirty()
+
+    def _report_save_error(self, error):
+        self.after(0, lambda: messagebox.showerror("Save Error", str(error)))
@@ -0,0 +1,108 @@
+from bisect import bisect_left, bisect_right
+
+
+# Joins block texts in the buffer; typed queries never contain it
+SEPARATOR = "\0"
+
+
+def _lower(text):
+    """Lowercase text without changing its length, so offsets stay valid."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # e.g. "İ" lowercases to two characters; keep such ones as they are
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class FileSearch:
+    """
+    Every match of a query inside one open file.
+
+    The blocks' texts are lowercased and joined into a single buffer once,
+    with the start offset of each block kept aside, so a query is one
+    str.find pass and a match maps back to (block index, start, end) with
+    a bisect. Typing more characters only re-checks the previous matches,
+    and next()/previous() just move through the list.
+    """
+
+    def __init__(self, contents):
+        self.starts = []
+        parts = []
+        offset = 0
+        for content in contents:
+            self.starts.append(offset)
+            parts.append(_lower(content))
+            offset += len(content) + len(SEPARATOR)
+
+        self.buffer = SEPARATOR.join(parts)
+        self.query = ""
+        self.positions = []
+        self.current = -1
+
+    def find(self, query):
+        """Search for query (any case); returns the number of matches."""
+        query = _lower(query)
+
+        if not query:
+            self.positions = []
+        elif self.query and query.startswith(self.query):
+            # extending the query: matches can only drop out
+            buffer = self.buffer
+            self.positions = [p for p in self.positions if buffer.startswith(query, p)]
+        else:
+            self.positions = self._scan(query)
+
+        self.query = query
+        self.current = 0 if self.positions else -1
+        return len(self.positions)
+
+    def _scan(self, query):
+        positions = []
+        buffer = self.buffer
+        pos = buffer.find(query)
+        while pos != -1:
+            positions.append(pos)
+            pos = buffer.find(query, pos + 1)
+        return positions
+
+    def match(self, i=None):
+        """(block index, start, end) of match i, by default the current one."""
+        if i is None:
+            i = self.current
+        if not 0 <= i < len(self.positions):
+            return None
+
+        pos = self.positions[i]
+        block = bisect_right(self.starts, pos) - 1
+        start = pos - self.starts[block]
+        return block, start, start + len(self.query)
+
+    def matches(self):
+        for i in range(len(self.positions)):
+            yield self.match(i)
+
+    def matches_in(self, block):
+        """(block, start, end) of the matches inside one block."""
+        start = self.starts[block]
+        if block + 1 < len(self.starts):
+            end = self.starts[block + 1] - len(SEPARATOR)
+        else:
+            end = len(self.buffer)
+
+        positions = self.positions
+        first = bisect_left(positions, start)
+        last = bisect_left(positions, end)
+        for pos in positions[first:last]:
+            yield block, pos - start, pos - start + len(self.query)
+
+    def next(self):
+        return self._step(1)
+
+    def previous(self):
+        return self._step(-1)
+
+    def _step(self, direction):
+        if not self.positions:
+            return None
+        self.current = (self.current + direction) % len(self.positions)
+        return self.match()
@@ -1,9 +1,11 @@
-import json
+import codepp_format
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from datetime import datetime
 from dialogs_ui import simple_prompt, center_window, warn_required_fields
 from ui_utils import init_placeholder
+from model import File
+from keyed_rows import KeyedRows
 
 
 class FileUIMixin:
@@ -12,130 +14,135 @@ class FileUIMixin:
 
     def render_file_list(self):
         self.current_file = None 
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        folder = self.workspace.folders[self.current_folder]
+        files = folder.files
 
-        folder_data = self.data["folders"][self.current_folder]
+        screen, fresh = self.show_screen(("files", self.current_folder, bool(files)))
 
-        header = ttk.Frame(self.content_frame)
-        header.pack(fill="x", pady=(0, 5))
+        if fresh:
+            header = ttk.Frame(screen)
+            header.pack(fill="x", pady=(0, 5))
 
-        ttk.Button(
-            header,
-            text="← Back",
-            command=self.back_to_home
-        ).pack(side="left")
+            ttk.Button(
+                header,
+                text="← Back",
+                command=self.back_to_home
+            ).pack(side="left")
 
-        ttk.Label(
-            header,
-            text=self.current_folder,
-            font=("Segoe UI", 16, "bold")
-        ).pack(side="left", padx=10)
-
-        ttk.Button(
-            header,
-            text="Create File",
-            command=self.create_file_popup
-        ).pack(side="right")
+            ttk.Label(
+                header,
+                text=self.current_folder,
+                font=("Segoe UI", 16, "bold")
+            ).pack(side="left", padx=10)
 
-        files = folder_data.get("files", {})
+            ttk.Button(
+                header,
+                text="Create File",
+                command=self.create_file_popup
+            ).pack(side="right")
 
         if not files:
-            empty_frame = ttk.Frame(self.content_frame)
-            empty_frame.pack(fill="both", pady=20)
+            if fresh:
+                empty_frame = ttk.Frame(screen)
+                empty_frame.pack(fill="both", pady=20)
 
-            ttk.Label(
-                empty_frame,
-                text="No files yet. Create one.",
-                foreground="gray",
-                font=("Segoe UI", 11)
-            ).pack(expand=True)
+                ttk.Label(
+                    empty_frame,
+                    text="No files yet. Create one.",
+                    foreground="gray",
+                    font=("Segoe UI", 11)
+                ).pack(expand=True)
 
             return
 
-        search_var = tk.StringVar()
-        search_entry = ttk.Entry(self.content_frame, textvariable=search_var)
-        search_entry.pack(fill="x", padx=5, pady=(0, 5))
-
-        container = ttk.Frame(self.content_frame)
-        container.pack(fill="both", expand=True)
-
-        canvas = tk.Canvas(container)
-        scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        list_frame = ttk.Frame(canvas)
-
-        list_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=list_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        if fresh:
+            search_var = tk.StringVar()
+            search_entry = ttk.Entry(screen, textvariable=search_var)
+            search_entry.pack(fill="x", padx=5, pady=(0, 5))
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+            container = ttk.Frame(screen)
+            container.pack(fill="both", expand=True)
 
-        self._folder_files_frame = list_frame
-        self._folder_files_canvas = canvas
-        self._folder_files_data = files
+            canvas = tk.Canvas(container)
+            scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
+            list_frame = ttk.Frame(canvas)
 
-        def populate_file_rows(filter_query=""):
-            for child in list_frame.winfo_children():
-                child.destroy()
-
-            filter_lower = filter_query.lower().strip()
+            list_frame.bind(
+                "<Configure>",
+                lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+            )
 
-            sorted_files_local = sorted(
-                self._folder_files_data.items(),
-                key=lambda item: self._get_created(item[1]),
-                reverse=True
+            canvas.create_window((0, 0), window=list_frame, anchor="nw")
+            canvas.configure(yscrollcommand=scrollbar.set)
+
+            canvas.pack(side="left", fill="both", expand=True)
+            scrollbar.pack(side="right", fill="y")
+
+            # rows are keyed by file name; filtering and edits only touch
+            # the rows that appear, disappear or change
+            rows = KeyedRows(
+                list_frame,
+                key=lambda row: row[0],
+                signature=lambda row: row[2],
+                build=self.render_file_row,
+                fill="x",
+                pady=10
             )
 
-            for file_name, file_data in sorted_files_local:
-                if filter_lower and filter_lower not in file_name.lower():
-                    continue
+            def populate_file_rows(*args):
+                filter_lower = search_var.get().lower().strip()
+                if filter_lower == search_entry.placeholder.lower():
+                    filter_lower = ""
 
-                item = ttk.Frame(list_frame, padding=8, relief="ridge")
-                item.pack(fill="x", pady=10)
+                rows.update(
+                    row for row in screen.files_data
+                    if not filter_lower or filter_lower in row[1]
+                )
 
-                ttk.Label(
-                    item,
-                    text=file_name,
-                    font=("Segoe UI", 12, "bold"),
-               
-                ).pack(side="left")
+            init_placeholder(search_entry, "Search files in this folder...")
+            search_var.trace_add("write", populate_file_rows)
+            screen.populate = populate_file_rows
 
+        # (name, lowercase name, created) in display order
+        screen.files_data = [
+            (name, name.lower(), files.summary(name)["created"])
+            for name in files.by_created()
+        ]
+        screen.populate()
 
-                ttk.Label(
-                    item,
-                    text=f"     {file_data.get("created", "")[:10]}",
-                    foreground="gray"
-                ).pack(side="right")
+    def render_file_row(self, parent, row):
+        file_name, _, created = row
+        item = ttk.Frame(parent, padding=8, relief="ridge")
 
-                def left_handler(e, n=file_name):
-                    self.open_file(n)
+        ttk.Label(
+            item,
+            text=file_name,
+            font=("Segoe UI", 12, "bold"),
+       
+        ).pack(side="left")
 
-                item.bind("<Button-1>", left_handler)
-                for w in item.winfo_children():
-                    w.bind("<Button-1>", left_handler)
 
-                def right_handler(e, n=file_name):
-                    self.show_file_context_menu(e, n)
+        ttk.Label(
+            item,
+            text=f"     {created[:10]}",
+            foreground="gray"
+        ).pack(side="right")
+
+        def left_handler(e, n=file_name):
+            self.open_file(n)
 
-                item.bind("<Button-3>", right_handler)
-                for w in item.winfo_children():
-                    w.bind("<Button-3>", right_handler)
+        item.bind("<Button-1>", left_handler)
+        for w in item.winfo_children():
+            w.bind("<Button-1>", left_handler)
 
-        init_placeholder(search_entry, "Search files in this folder...")
-        populate_file_rows()
+        def right_handler(e, n=file_name):
+            self.show_file_context_menu(e, n)
 
-        def on_folder_search_change(*args):
-            query = search_var.get()
-            if query == getattr(search_entry, "placeholder", ""):
-                query = ""
-            populate_file_rows(query)
+        item.bind("<Button-3>", right_handler)
+        for w in item.winfo_children():
+            w.bind("<Button-3>", right_handler)
 
-        search_var.trace_add("write", on_folder_search_change)
+        return item
 
     def show_file_context_menu(self, event, file_name):
         menu = tk.Menu(self, tearoff=0)
@@ -145,44 +152,42 @@ class FileUIMixin:
         menu.tk_popup(event.x_root, event.y_root)
 
     def rename_file(self, old_name):
-        folder = self.data["folders"][self.current_folder]
+        folder = self.workspace.folders[self.current_folder]
         new_name = simple_prompt(self, "Rename File", "New file name:", old_name)
         if not new_name or new_name == old_name:
             return
-        if new_name in folder.get("files", {}):
+        if new_name in folder.files:
             messagebox.showerror("Error", "A file with this name already exists in this folder.")
             return
 
-        folder["files"][new_name] = folder["files"].pop(old_name)
+        folder.files[new_name] = folder.files.pop(old_name)
 
         if self.current_file == old_name:
             self.current_file = new_name
 
-        self.save_data()
+        self.save_data(
+            ("rename", ["folders", self.current_folder, "files", old_name], new_name)
+        )
         self.render_file_list()
 
     def delete_file(self, file_name):
         if not messagebox.askyesno("Delete File", f"Delete file '{file_name}'?"):
             return
-        folder = self.data["folders"][self.current_folder]
-        folder["files"].pop(file_name, None)
+        folder = self.workspace.folders[self.current_folder]
+        file = folder.files.pop(file_name, None)
+        if file is not None:
+            self.assets.release_blocks(file.blocks)
         if self.current_file == file_name:
             self.current_file = None
-        self.save_data()
+        self.save_data(("delete", ["folders", self.current_folder, "files", file_name]))
         self.render_file_list()
 
     def share_file(self, file_name):
-        folder = self.data["folders"][self.current_folder]
-        file_data = folder["files"].get(file_name)
-        if not file_data:
+        folder = self.workspace.folders[self.current_folder]
+        file = folder.files.get(file_name)
+        if not file:
             return
 
-        export_data = {
-            "type": "file",
-            "name": file_name,
-            "data": file_data
-        }
-
         path = filedialog.asksaveasfilename(
             defaultextension=".codepp",
             initialfile=f"{self.current_folder}_{file_name}.codepp",
@@ -192,8 +197,7 @@ class FileUIMixin:
             return
 
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(export_data, f, indent=4)
+            codepp_format.write_export(path, "file", file_name, file.to_dict())
             messagebox.showinfo("Exported", "File exported successfully.\nAsk your friend to import this file in Code++.")
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
@@ -225,19 +229,16 @@ class FileUIMixin:
                 warn_required_fields()
                 return
 
-            folder = self.data["folders"][self.current_folder]
+            folder = self.workspace.folders[self.current_folder]
 
-            if name in folder.get("files", {}):
+            if name in folder.files:
                 messagebox.showerror("Error", "File already exists")
                 return
 
             now = datetime.now().isoformat()
-            folder["files"][name] = {
-                "created": now,
-                "blocks": []
-            }
+            folder.files[name] = File(created=now)
 
-            self.save_data()
+            self.save_data(("set", ["folders", self.current_folder, "files", name]))
             self.render_file_list()
             popup.destroy()
 
@@ -252,8 +253,7 @@ class FileUIMixin:
             return
 
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                payload = json.load(f)
+            payload = codepp_format.read(path)
 
             if payload.get("type") != "file":
                 raise ValueError("Invalid file")
@@ -270,7 +270,7 @@ class FileUIMixin:
             for block in data.get("blocks", []):
                 block["created"] = now
 
-            folder = self.data["folders"][self.current_folder]["files"]
+            folder = self.workspace.folders[self.current_folder].files
 
             base = name
             i = 1
@@ -278,8 +278,10 @@ class FileUIMixin:
                 name = f"{base}_{i}"
                 i += 1
 
-            folder[name] = data
-            self.save_data()
+            file = File.from_dict(data)
+            self.assets.retain_blocks(file.blocks)
+            folder[name] = file
+            self.save_data(("set", ["folders", self.current_folder, "files", name]))
             self.render_file_list()
             messagebox.showinfo("Imported", "File imported successfully.")
 
@@ -0,0 +1,163 @@
+from tkinter import ttk
+
+
+CARD_WIDTH = 160
+CARD_HEIGHT = 170
+CARD_PAD = 10
+COLUMNS = 12
+# Rows of cards kept ready above and below the visible ones
+OVERSCAN_ROWS = 2
+
+
+class _Card:
+    """One pooled folder card; show() points it at another folder."""
+
+    def __init__(self, grid):
+        canvas = grid.canvas
+        self.name = None
+        self.index = None
+        self.text = None
+
+        self.frame = ttk.Frame(canvas, padding=10, relief="ridge")
+        icon = ttk.Label(self.frame, text="📁", font=("Segoe UI", 40))
+        icon.pack()
+        self.title = ttk.Label(
+            self.frame,
+            font=("Segoe UI", 12, "bold"),
+            wraplength=CARD_WIDTH - 20,
+            justify="center"
+        )
+        self.title.pack()
+        self.subtitle = ttk.Label(self.frame, foreground="gray")
+        self.subtitle.pack()
+
+        # bound once; the handlers read whatever folder the card shows now
+        for widget in (self.frame, icon, self.title, self.subtitle):
+            widget.bind("<Button-1>", lambda e: grid.on_open(self.name))
+            widget.bind("<Button-3>", lambda e: grid.on_menu(e, self.name))
+
+        self.item = canvas.create_window(
+            0, 0,
+            window=self.frame,
+            anchor="nw",
+            width=CARD_WIDTH,
+            height=CARD_HEIGHT,
+            state="hidden"
+        )
+
+    def show(self, name, subtitle):
+        if name != self.name:
+            self.name = name
+            self.title.configure(text=name)
+        if subtitle != self.text:
+            self.text = subtitle
+            self.subtitle.configure(text=subtitle)
+
+
+class FolderGrid:
+    """
+    The home screen's folder cards, built only for the rows in view.
+
+    Cards sit on a fixed grid, so the visible rows follow directly from
+    the scroll position. Cards that scroll out of view go back to a pool
+    and are handed the next folders that scroll in; new card widgets are
+    only created while the pool is empty.
+
+    Cards are keyed by folder name: update(names) after a rename, delete
+    or import keeps every card whose folder is still in view, only moving
+    it if its position changed.
+    """
+
+    def __init__(self, canvas, scrollbar, names, subtitle, on_open, on_menu):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.names = names
+        self.subtitle = subtitle
+        self.on_open = on_open
+        self.on_menu = on_menu
+
+        self.columns = 0
+        self.cards = {}  # folder name -> _Card
+        self.free = []
+        self._pending = False
+
+        canvas.configure(yscrollcommand=self._on_scroll)
+        canvas.bind("<Configure>", lambda e: self._schedule())
+        self.refresh()
+
+    def update(self, names):
+        self.names = names
+        self.refresh()
+
+    def _layout(self):
+        width = max(1, self.canvas.winfo_width())
+        columns = max(1, min(COLUMNS, width // (CARD_WIDTH + 2 * CARD_PAD)))
+        rows = -(-len(self.names) // columns)
+        self.canvas.configure(
+            scrollregion=(0, 0, width, max(1, rows * (CARD_HEIGHT + 2 * CARD_PAD)))
+        )
+
+        if columns != self.columns:
+            # every card moves; let refresh place them again
+            self.columns = columns
+            for card in self.cards.values():
+                card.index = None
+
+    def refresh(self):
+        """Show cards for the rows near the view and pool the rest."""
+        if not self.canvas.winfo_exists():
+            return
+        self._layout()
+
+        row_height = CARD_HEIGHT + 2 * CARD_PAD
+        top = self.canvas.canvasy(0)
+        bottom = top + max(1, self.canvas.winfo_height())
+        first_row = max(0, int(top // row_height) - OVERSCAN_ROWS)
+        last_row = int(bottom // row_height) + OVERSCAN_ROWS + 1
+
+        first = first_row * self.columns
+        last = min(len(self.names), last_row * self.columns)
+        visible = self.names[first:last]
+
+        wanted = set(visible)
+        for name in [n for n in self.cards if n not in wanted]:
+            self._release(name)
+
+        for index, name in enumerate(visible, first):
+            card = self.cards.get(name)
+            if card is None:
+                card = self.free.pop() if self.free else _Card(self)
+                self.cards[name] = card
+                self.canvas.itemconfigure(card.item, state="normal")
+
+            card.show(name, self.subtitle(name))
+            if card.index != index:
+                self._place(card, index)
+
+    def _place(self, card, index):
+        card.index = index
+        row, col = divmod(index, self.columns)
+        self.canvas.coords(
+            card.item,
+            CARD_PAD + col * (CARD_WIDTH + 2 * CARD_PAD),
+            CARD_PAD + row * (CARD_HEIGHT + 2 * CARD_PAD)
+        )
+
+    def _release(self, name):
+        card = self.cards.pop(name)
+        card.index = None
+        self.canvas.itemconfigure(card.item, state="hidden")
+        self.free.append(card)
+
+    def _schedule(self):
+        if not self._pending:
+            self._pending = True
+            self.canvas.after_idle(self._update)
+
+    def _update(self):
+        self._pending = False
+        self.refresh()
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule()
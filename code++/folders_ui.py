@@ -1,8 +1,10 @@
-import json
+import codepp_format
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from datetime import datetime
 from dialogs_ui import simple_prompt, center_window, warn_required_fields
+from model import Folder
+from folder_grid import FolderGrid
 
 
 
@@ -11,76 +13,39 @@ class FolderUIMixin:
     # ---------------- FOLDERS ----------------
 
     def render_folders(self):
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
-
-        folders = self.data.get("folders", {})
+        folders = self.workspace.folders
 
         if not folders:
-            ttk.Label(
-                self.content_frame,
-                text="No folders yet. Create one.",
-                foreground="gray"
-            ).pack(expand=True)
+            screen, fresh = self.show_screen(("folders", None))
+            if fresh:
+                ttk.Label(
+                    screen,
+                    text="No folders yet. Create one.",
+                    foreground="gray"
+                ).pack(expand=True)
             return
 
-        container = ttk.Frame(self.content_frame)
-        container.pack(fill="both", expand=True)
-
-        canvas = tk.Canvas(container)
-        scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        grid = ttk.Frame(canvas)
-
-        grid.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=grid, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-        cols = 12
-        row = col = 0
+        screen, fresh = self.show_screen(("folders",))
 
-        sorted_folders = sorted(
-            folders.items(),
-            key=lambda item: self._get_created(item[1]),
-            reverse=True
-        )
-
-        for folder_name, folder_data in sorted_folders:
-            card = ttk.Frame(grid, padding=10, relief="ridge")
-            card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-
-            ttk.Label(card, text="📁", font=("Segoe UI", 40)).pack()
-            ttk.Label(card, text=folder_name, font=("Segoe UI", 12, "bold")).pack()
-            ttk.Label(
-                card,
-                text=f"{len(folder_data.get('files', {}))} files",
-                foreground="gray"
-            ).pack()
-
-            def left_handler(e, n=folder_name):
-                self.open_folder(n)
+        if fresh:
+            canvas = tk.Canvas(screen)
+            scrollbar = ttk.Scrollbar(screen, orient="vertical", command=canvas.yview)
 
-            card.bind("<Button-1>", left_handler)
-            for w in card.winfo_children():
-                w.bind("<Button-1>", left_handler)
+            canvas.pack(side="left", fill="both", expand=True)
+            scrollbar.pack(side="right", fill="y")
 
-            def right_handler(e, n=folder_name):
-                self.show_folder_context_menu(e, n)
+            # summaries only: folder contents stay unloaded until opened,
+            # and only the cards in view are built (see FolderGrid)
+            screen.grid = FolderGrid(
+                canvas,
+                scrollbar,
+                [],
+                lambda name: f"{self.workspace.folders.summary(name)['file_count']} files",
+                self.open_folder,
+                self.show_folder_context_menu
+            )
 
-            card.bind("<Button-3>", right_handler)
-            for w in card.winfo_children():
-                w.bind("<Button-3>", right_handler)
-
-            col += 1
-            if col >= cols:
-                col = 0
-                row += 1
+        screen.grid.update(list(folders.by_created()))
 
     def show_folder_context_menu(self, event, folder_name):
         menu = tk.Menu(self, tearoff=0)
@@ -95,38 +60,35 @@ class FolderUIMixin:
         if not new_name or new_name == old_name:
             return
 
-        if new_name in self.data["folders"]:
+        if new_name in self.workspace.folders:
             messagebox.showerror("Error", "A folder with this name already exists.")
             return
 
-        self.data["folders"][new_name] = self.data["folders"].pop(old_name)
+        self.workspace.folders[new_name] = self.workspace.folders.pop(old_name)
 
         if self.current_folder == old_name:
             self.current_folder = new_name
 
-        self.save_data()
+        self.save_data(("rename", ["folders", old_name], new_name))
         self.render_folders()
 
     def delete_folder(self, folder_name):
         if not messagebox.askyesno("Delete Folder", f"Delete folder '{folder_name}' and all its files?"):
             return
-        self.data["folders"].pop(folder_name, None)
+        folder = self.workspace.folders.pop(folder_name, None)
+        if folder is not None:
+            for file in folder.files.values():
+                self.assets.release_blocks(file.blocks)
         if self.current_folder == folder_name:
             self.current_folder = None
-        self.save_data()
+        self.save_data(("delete", ["folders", folder_name]))
         self.render_folders()
 
     def share_folder(self, folder_name):
-        folder_data = self.data["folders"].get(folder_name)
-        if not folder_data:
+        folder = self.workspace.folders.get(folder_name)
+        if not folder:
             return
 
-        export_data = {
-            "type": "folder",
-            "name": folder_name,
-            "data": folder_data
-        }
-
         path = filedialog.asksaveasfilename(
             defaultextension=".codepp",
             initialfile=f"{folder_name}.codepp",
@@ -136,8 +98,7 @@ class FolderUIMixin:
             return
 
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(export_data, f, indent=4)
+            codepp_format.write_export(path, "folder", folder_name, folder.to_dict())
             messagebox.showinfo("Exported", "Folder exported successfully.\nAsk your friend to import this folder in Code++.")
         except Exception as e:
             messagebox.showerror("Export Error", str(e))
@@ -165,20 +126,14 @@ class FolderUIMixin:
                 warn_required_fields()
                 return
 
-            if name in self.data.get("folders", {}):
+            if name in self.workspace.folders:
                 messagebox.showerror("Error", "Folder already exists")
                 return
 
-            if "folders" not in self.data:
-                self.data["folders"] = {}
-
             now = datetime.now().isoformat()
-            self.data["folders"][name] = {
-                "created": now,
-                "files": {}
-            }
+            self.workspace.folders[name] = Folder(created=now)
 
-            self.save_data()
+            self.save_data(("set", ["folders", name]))
             self.render_folders()
             popup.destroy()
 
@@ -195,8 +150,7 @@ class FolderUIMixin:
             return
 
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                payload = json.load(f)
+            payload = codepp_format.read(path)
 
             if payload.get("type") != "folder":
                 raise ValueError("Invalid folder file")
@@ -217,12 +171,15 @@ class FolderUIMixin:
 
             base = name
             i = 1
-            while name in self.data["folders"]:
+            while name in self.workspace.folders:
                 name = f"{base}_{i}"
                 i += 1
 
-            self.data["folders"][name] = data
-            self.save_data()
+            folder = Folder.from_dict(data)
+            for file in folder.files.values():
+                self.assets.retain_blocks(file.blocks)
+            self.workspace.folders[name] = folder
+            self.save_data(("set", ["folders", name]))
             self.render_folders()
             messagebox.showinfo("Imported", "Folder imported successfully.")
 
@@ -0,0 +1,85 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+IMAGE_WORKERS = 2
+POLL_MS = 30
+
+
+class ImageLoader:
+    """
+    Decodes and scales thumbnails on worker threads.
+
+    PIL work runs in the pool; finished images are queued and picked up by
+    an after() poll on the Tk thread, where the PhotoImage is created and
+    handed to the callback. Each file render starts a new generation, and
+    results from older generations are dropped instead of painted.
+    """
+
+    def __init__(self, app, thumbnails):
+        self.app = app
+        self.thumbnails = thumbnails
+        self.generation = 0
+        self._pool = None
+        self._jobs = []
+        self._done = queue.Queue()
+        self._pending = 0
+        self._polling = False
+
+    def new_generation(self):
+        self.generation += 1
+        for future in self._jobs:
+            future.cancel()
+        self._jobs = []
+        return self.generation
+
+    def request(self, path, key, on_ready, on_error):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=IMAGE_WORKERS, thread_name_prefix="codepp-images"
+            )
+
+        generation = self.generation
+        future = self._pool.submit(self.thumbnails.scaled, path, key)
+        future.add_done_callback(
+            lambda f: self._done.put((generation, key, f, on_ready, on_error))
+        )
+        self._jobs.append(future)
+        self._pending += 1
+
+        if not self._polling:
+            self._polling = True
+            self.app.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        from PIL import ImageTk
+
+        while True:
+            try:
+                generation, key, future, on_ready, on_error = self._done.get_nowait()
+            except queue.Empty:
+                break
+
+            self._pending -= 1
+            if future.cancelled() or generation != self.generation:
+                continue
+            try:
+                photo = ImageTk.PhotoImage(future.result())
+            except Exception:
+                on_error()
+                continue
+            self.thumbnails.remember(key, photo)
+            on_ready(photo)
+
+        # every job reports back once, even when cancelled
+        self._jobs = [f for f in self._jobs if not f.done()]
+        if self._pending:
+            self.app.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def close(self):
+        self.new_generation()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+
+import codepp_format
+from model import json_default, plain
+
+JOURNAL_SUFFIX = ".journal"
+COMPACTING_SUFFIX = ".compacting"
+NEXT_SUFFIX = ".next"
+
+# Fold the log into a fresh snapshot once it grows past this many bytes
+COMPACT_THRESHOLD = 512 * 1024
+
+
+def _child(node, key):
+    # model objects expose "meta", "folders", "files", "blocks" as slots
+    if isinstance(key, str) and key in getattr(type(node), "__slots__", ()):
+        return getattr(node, key)
+    return node[key]
+
+
+def _resolve(data, path):
+    node = data
+    for key in path:
+        node = _child(node, key)
+    return node
+
+
+def encode_change(data, seq, change):
+    """
+    Turn a change tuple into one journal line.
+
+    ("set", path)          -> stores the current value found at path
+    ("delete", path)       -> removes the key / list index at path
+    ("rename", path, new)  -> moves the dict entry at path to a new key
+    """
+    op, path, *rest = change
+    record = {"seq": seq, "op": op, "path": list(path)}
+
+    if op == "set":
+        record["value"] = _resolve(data, path)
+    elif op == "rename":
+        record["to"] = rest[0]
+    elif op != "delete":
+        raise ValueError(f"Unknown change: {op}")
+
+    return json.dumps(record, ensure_ascii=False, default=json_default)
+
+
+def apply_record(data, record):
+    """Apply one record to a plain JSON tree or to a model Workspace."""
+    path = record["path"]
+    parent = _resolve(data, path[:-1])
+    key = path[-1]
+    op = record["op"]
+
+    if op == "set":
+        value = record["value"]
+        adopt = getattr(parent, "adopt", None)
+        if adopt is not None:
+            value = adopt(value)
+
+        if isinstance(parent, list) and key == len(parent):
+            parent.append(value)
+        else:
+            parent[key] = value
+
+    elif op == "delete":
+        if isinstance(parent, list):
+            if 0 <= key < len(parent):
+                del parent[key]
+        else:
+            parent.pop(key, None)
+
+    elif op == "rename":
+        if key in parent:
+            parent[record["to"]] = parent.pop(key)
+
+
+def read_records(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # torn write from a crash: everything after it is unusable
+                break
+    return records
+
+
+def _fold(data, paths):
+    meta = _child(data, "meta")
+    last_seq = meta.get("journal_seq", 0)
+
+    for path in paths:
+        for record in read_records(path):
+            if record.get("seq", 0) <= last_seq:
+                continue
+            try:
+                apply_record(data, record)
+            except (KeyError, IndexError, TypeError):
+                continue
+            last_seq = record["seq"]
+
+    meta["journal_seq"] = last_seq
+    return last_seq
+
+
+class Journal:
+    """
+    Append-only change log kept next to the workspace file.
+
+    Every mutation is appended as one small JSON line. When the log grows
+    past COMPACT_THRESHOLD it is rotated aside and folded into a fresh
+    snapshot on a background thread, so new edits keep appending meanwhile.
+
+    The fresh snapshot is written next to the live one (".next") and only
+    swapped in by promote() at the next load: folders that were never
+    opened are still read lazily from the live file's chunks.
+    """
+
+    def __init__(self, data_path, threshold=COMPACT_THRESHOLD):
+        self.data_path = data_path
+        self.path = data_path + JOURNAL_SUFFIX
+        self.compacting_path = self.path + COMPACTING_SUFFIX
+        self.next_path = data_path + NEXT_SUFFIX
+        self.threshold = threshold
+        self.seq = 0
+
+        self._lock = threading.Lock()
+        # guards seq; never held across disk I/O, so the UI thread never waits
+        self._seq_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compact_thread = None
+
+    # ---------------- LOAD ----------------
+
+    def promote(self):
+        """Swap in a snapshot compacted during the previous session."""
+        if os.path.exists(self.next_path):
+            os.replace(self.next_path, self.data_path)
+
+    def replay(self, data):
+        """Apply every record newer than the snapshot onto data."""
+        self.seq = _fold(data, (self.compacting_path, self.path))
+        return data
+
+    def has_records(self):
+        return any(
+            os.path.exists(p) and os.path.getsize(p) > 0
+            for p in (self.compacting_path, self.path)
+        )
+
+    # ---------------- WRITE ----------------
+
+    def encode(self, data, changes):
+        """Number and serialize changes; cheap enough for the UI thread."""
+        lines = []
+        with self._seq_lock:
+            for change in changes:
+                self.seq += 1
+                lines.append(encode_change(data, self.seq, change))
+        return lines
+
+    def snapshot(self, data):
+        """
+        Plain copy of data and the seq it is current to, for write_full().
+
+        Taken on the UI thread, so the save worker never walks the live
+        model while it is being edited.
+        """
+        with self._seq_lock:
+            copy = plain(data)
+            copy["meta"] = dict(copy["meta"])
+            return copy, self.seq
+
+    def append(self, lines):
+        with self._lock:
+            try:
+                start = os.path.getsize(self.path)
+            except FileNotFoundError:
+                start = 0
+
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                    size = f.tell()
+            except Exception:
+                # a torn line would hide every later record from replay;
+                # the caller retries the whole batch
+                try:
+                    with open(self.path, "r+b") as f:
+                        f.truncate(start)
+                except OSError:
+                    pass
+                raise
+
+        if size >= self.threshold:
+            self.compact_in_background()
+
+    def write_full(self, data, seq):
+        """Replace the snapshot with data, current to seq, and drop the log."""
+        self.wait()
+        with self._compact_lock, self._lock:
+            _child(data, "meta")["journal_seq"] = seq
+            codepp_format.write_workspace(self.data_path, data)
+            for path in (self.compacting_path, self.path, self.next_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # ---------------- COMPACTION ----------------
+
+    def compact_in_background(self):
+        if self._compact_thread and self._compact_thread.is_alive():
+            return
+        self._compact_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compact_thread.start()
+
+    def compact(self):
+        with self._compact_lock:
+            with self._lock:
+                # a leftover file from an interrupted run is folded first
+                if not os.path.exists(self.compacting_path):
+                    if not os.path.exists(self.path):
+                        return
+                    os.replace(self.path, self.compacting_path)
+
+            base = self.next_path
+            if not os.path.exists(base):
+                base = self.data_path
+            data = codepp_format.read(base)
+
+            _fold(data, (self.compacting_path,))
+            codepp_format.write_workspace(self.next_path, data)
+            os.remove(self.compacting_path)
+
+    def wait(self):
+        thread = self._compact_thread
+        if thread and thread.is_alive():
+            thread.join()
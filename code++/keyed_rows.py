@@ -0,0 +1,74 @@
+class KeyedRows:
+    """
+    Packed rows of a list screen, kept in step with the data by key.
+
+    update(items) compares the new items against the rows on screen:
+    rows whose key and signature are unchanged are kept as they are,
+    changed ones are rebuilt, missing ones are destroyed and new ones are
+    built. Only rows that end up out of order are packed again, so
+    deleting or renaming one item touches one widget.
+
+    key(item) must be stable for the same item; signature(item) is
+    whatever the row shows of it. build(parent, item) returns the row,
+    unpacked.
+    """
+
+    def __init__(self, parent, key, signature, build, **pack_options):
+        self.parent = parent
+        self.key = key
+        self.signature = signature
+        self.build = build
+        self.pack_options = pack_options
+
+        self.rows = {}  # key -> (signature, widget, item)
+        self.order = []  # widgets, in packed order
+
+    def update(self, items):
+        rows = {}
+        wanted = []
+
+        for item in items:
+            key = self.key(item)
+            signature = self.signature(item)
+            old = self.rows.pop(key, None)
+
+            if old is not None and old[0] == signature:
+                widget = old[1]
+            else:
+                if old is not None:
+                    old[1].destroy()
+                widget = self.build(self.parent, item)
+
+            rows[key] = (signature, widget, item)
+            wanted.append(widget)
+
+        for _, widget, _ in self.rows.values():
+            widget.destroy()
+        self.rows = rows
+
+        self._arrange(wanted)
+
+    def _arrange(self, wanted):
+        keep = set(map(id, wanted))
+        order = [w for w in self.order if id(w) in keep]
+
+        for i, widget in enumerate(wanted):
+            if i < len(order) and order[i] is widget:
+                continue
+
+            if widget in order:
+                order.remove(widget)
+            order.insert(i, widget)
+
+            if i > 0:
+                widget.pack(after=order[i - 1], **self.pack_options)
+            elif len(order) > 1:
+                widget.pack(before=order[1], **self.pack_options)
+            else:
+                widget.pack(**self.pack_options)
+
+        self.order = order
+
+    def widget(self, key):
+        row = self.rows.get(key)
+        return row[1] if row is not None else None
@@ -0,0 +1,71 @@
+from collections.abc import MutableMapping
+
+
+class LazyMapping(MutableMapping):
+    """
+    Ordered name -> value mapping whose values are loaded on first access.
+
+    Until a value is loaded only its small summary (created time, counts)
+    is kept, which is all the list screens need to render.
+    """
+
+    def __init__(self, summaries, loader, summarize):
+        self._summaries = dict(summaries)
+        self._values = {}
+        self._loader = loader
+        self._summarize = summarize
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            summary = self._summaries[key]
+
+        value = self._loader(key, summary)
+        # two threads may race to load the same key; both get the first
+        return self._values.setdefault(key, value)
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+        self._summaries[key] = None
+
+    def __delitem__(self, key):
+        del self._summaries[key]
+        self._values.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._summaries
+
+    def __iter__(self):
+        return iter(self._summaries)
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def is_loaded(self, key):
+        return key in self._values
+
+    def peek(self, key):
+        """
+        (value, None) if key is loaded, else (None, its summary), without
+        loading anything, so other threads may call it. KeyError if key
+        is missing.
+        """
+        value = self._values.get(key)
+        if value is not None:
+            return value, None
+        summary = self._summaries[key]
+        if summary is None:
+            # assigned by __setitem__ since the first look
+            return self._values[key], None
+        return None, summary
+
+    def summary(self, key):
+        if key in self._values:
+            return self._summarize(self._values[key])
+        return self._summaries[key]
+
+    def summaries(self):
+        """Yield (name, summary) without loading anything that is still lazy."""
+        for key in self._summaries:
+            yield key, self.summary(key)
@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import sys
 import traceback
@@ -11,6 +12,8 @@ def main():
     app.mainloop()
 
 if __name__ == "__main__":
+    # the regex matcher process re-runs this executable when frozen
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception:
@@ -1,9 +1,20 @@
 import os
+import re
 import sys
-import json
+from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tray import TrayManager
+import codepp_format
+from model import Workspace
+from asset_store import AssetStore
+from thumbnail_cache import ThumbnailCache
+from image_loader import ImageLoader
+from search_scheduler import SearchScheduler
+from search_index import RankedPage
+from search_regex import RegexHits
+from keyed_rows import KeyedRows
+from screen_cache import ScreenCache
 
 from data_manager import (
     DataManagerMixin,
@@ -47,7 +58,7 @@ class NotesApp(
         self.search_results = []
 
         # -------- DATA --------
-        self.data = {}
+        self.workspace = Workspace()
         self.data_path = DEFAULT_FILE
 
         self.ensure_default_file()
@@ -61,6 +72,21 @@ class NotesApp(
 
         self.load_data(self.data_path)
 
+        self.assets = AssetStore(self.assets_dir, os.path.dirname(self.data_path))
+        self.assets.collect_garbage()
+        self.thumbnails = ThumbnailCache(
+            os.path.join(os.path.dirname(self.data_path), "cache", "thumbnails")
+        )
+        # same startup pass: thumbnails of images collected above go too
+        self.thumbnails.prune(self.assets.names())
+        self.images = ImageLoader(self, self.thumbnails)
+        self.screens = ScreenCache()
+        self.searcher = SearchScheduler(
+            self,
+            self.run_search,
+            on_error=lambda e: messagebox.showerror("Search Error", str(e))
+        )
+
         # -------- STYLE --------
         self.style = ttk.Style(self)
         self.style.configure("Highlight.TFrame", background="#fff2a8")
@@ -158,6 +184,23 @@ class NotesApp(
         search_frame.pack(fill="x")
 
         self.search_var = tk.StringVar()
+        self.rank_var = tk.BooleanVar(value=True)
+        self.regex_var = tk.BooleanVar(value=False)
+
+        ttk.Checkbutton(
+            search_frame,
+            text="Regex",
+            variable=self.regex_var,
+            command=self.refresh_search
+        ).pack(side="right", padx=(8, 0))
+
+        ttk.Checkbutton(
+            search_frame,
+            text="Best match first",
+            variable=self.rank_var,
+            command=self.refresh_search
+        ).pack(side="right", padx=(8, 0))
+
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         search_entry.pack(fill="x")
         search_entry.bind("<KeyRelease>", self.global_search)
@@ -220,8 +263,7 @@ class NotesApp(
 
         try:
             # 1️⃣ Load selected file
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = codepp_format.read(file_path)
 
             if "folders" not in data:
                 raise ValueError("Invalid Code++ file")
@@ -239,13 +281,18 @@ class NotesApp(
             if "folders" not in data:
                 data["folders"] = {}
 
-            # 3️⃣ OVERWRITE default workspace file
-            with open(DEFAULT_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
+            # 3️⃣ Reload app state from the loaded data
+            self.workspace = Workspace.from_dict(data)
+            self.assets.recount(
+                block
+                for folder in self.workspace.folders.values()
+                for file in folder.files.values()
+                for block in file.blocks
+            )
 
-            # 4️⃣ Reload app state from default workspace
-            self.data = data
-            self.data_path = DEFAULT_FILE
+            # 4️⃣ OVERWRITE default workspace file (and drop its journal)
+            self.save_data()
+            self.warm_search_index()
 
             self.current_folder = None
             self.current_file = None
@@ -275,8 +322,7 @@ class NotesApp(
             return
 
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=4)
+            codepp_format.write_workspace(file_path, self.workspace)
 
             messagebox.showinfo(
                 "Backup Created",
@@ -286,72 +332,182 @@ class NotesApp(
         except Exception as e:
             messagebox.showerror("Backup Error", str(e))
 
+    # ---------------- SCREENS ----------------
+
+    def show_screen(self, key):
+        """
+        The frame of the screen identified by key, and whether it is new.
+
+        Asking again for the screen that is showing returns it untouched,
+        so the caller only updates what changed (see KeyedRows). The
+        screen being left is hidden in self.screens, and a recently left
+        screen comes back from there with screen.restored set; only
+        otherwise is a fresh, empty screen created.
+        """
+        screen = getattr(self, "_screen", None)
+        if screen is not None and screen.winfo_exists():
+            if screen.key == key:
+                screen.restored = False
+                return screen, False
+            screen.pack_forget()
+            self.screens.put(screen)
+
+        screen = self.screens.take(key)
+        fresh = screen is None
+        if fresh:
+            screen = ttk.Frame(self.content_frame)
+            screen.key = key
+
+        screen.restored = not fresh
+        screen.pack(fill="both", expand=True)
+        self._screen = screen
+        return screen, fresh
+
     # ---------------- SEARCH ----------------
 
     def global_search(self, event=None):
         query = self.search_var.get().strip().lower()
+        regex = self.regex_var.get()
 
         if not query or query == getattr(self, "global_placeholder", "").lower():
+            self.searcher.cancel()
             self.render_folders()
             return
 
-        results = []
+        # patterns are case-sensitive text ("\D" is not "\d")
+        if regex:
+            query = self.search_var.get().strip()
 
-        for folder_name, folder in self.data.get("folders", {}).items():
-            for file_name, file in folder.get("files", {}).items():
+        # Shift, arrows etc. don't change the query; keep what is on screen
+        shown = getattr(self, "_results_widget", None)
+        if query == getattr(self, "_results_query", None) and shown is not None and shown is self._screen:
+            self.searcher.cancel()
+            return
 
-                if query in file_name.lower():
-                    results.append((folder_name, file_name, None))
-                    continue
+        def show(results):
+            self._results_query = query
+            if isinstance(results, str):
+                self.render_search_results([], message=results)
+            elif isinstance(results, RankedPage):
+                self.render_search_results(results, page=results)
+            elif isinstance(results, RegexHits) and results.truncated:
+                self.render_search_results(
+                    results,
+                    message="Search took too long, showing the first matches only"
+                )
+            else:
+                self.render_search_results(results)
+
+        self.searcher.submit((query, self.rank_var.get(), regex), show)
+
+    def refresh_search(self):
+        self._results_query = None
+        self.global_search()
+
+    def run_search(self, request, cancelled):
+        # search worker thread
+        if isinstance(request, RankedPage):
+            # "Show more" after that page of a ranked search
+            return self.search_index.more(request.cursor, cancelled)
+
+        query, ranked, regex = request
+        if regex:
+            try:
+                return self.search_index.regex_search(self.reader, query, cancelled)
+            except re.error as e:
+                return f"Invalid pattern: {e}"
+        if ranked:
+            return self.search_index.ranked(self.reader, query, cancelled)
+        return self.search_index.search(self.reader, query, cancelled)
+
+    def render_search_results(self, results, page=None, message=None):
+        screen, fresh = self.show_screen(("search",))
+
+        if fresh:
+            screen.note = ttk.Label(screen, foreground="gray")
+            screen.items = ttk.Frame(screen)
+            screen.items.pack(fill="x")
+            screen.rows = KeyedRows(
+                screen.items,
+                key=lambda r: (r[0], r[1], id(r[2])),
+                signature=self.result_text,
+                build=self.render_result_item,
+                fill="x",
+                pady=5
+            )
+            screen.more = ttk.Button(screen, text="Show more")
 
-                for block in file.get("blocks", []):
-                    content = block.get("content", "")
-                    searchable = (content).lower()
+        self._results_widget = screen
+        screen.results = list(results)
+        screen.rows.update(screen.results)
 
-                    if query in searchable:
-                        results.append((folder_name, file_name, block))
-                        break
+        screen.note.pack_forget()
+        if not results:
+            screen.note.configure(text=message or "No results found")
+            screen.note.pack(expand=True, before=screen.items)
+        elif message:
+            screen.note.configure(text=message)
+            screen.note.pack(anchor="w", before=screen.items)
+
+        # pages are verified on the search worker, like the search itself
+        def show_more():
+            screen.more.state(["disabled"])
+            self.searcher.submit(page, add_page, delay=0)
+
+        def add_page(next_page):
+            screen.more.state(["!disabled"])
+            screen.results.extend(next_page)
+            screen.rows.update(screen.results)
+            if not next_page.more:
+                screen.more.pack_forget()
+
+        screen.more.configure(command=show_more)
+        screen.more.state(["!disabled"])
+        if page is not None and page.more:
+            screen.more.pack(pady=5)
+        else:
+            screen.more.pack_forget()
 
-        self.render_search_results(results)
+    def result_text(self, result):
+        folder_name, file_name, block, *span = result
+        text = f"{folder_name}  →  {file_name}"
 
-    def render_search_results(self, results):
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        if block and span:
+            # regex hit: show the match with a little context
+            start = span[0][0]
+            preview = block.content[max(0, start - 15):start + 40]
+            preview = " ".join(preview.split())
+            if preview:
+                text += f"  →  {preview}"
 
-        if not results:
-            ttk.Label(
-                self.content_frame,
-                text="No results found",
-                foreground="gray"
-            ).pack(expand=True)
-            return
+        elif block:
+            preview = ""
 
-        for folder_name, file_name, block in results:
-            item = ttk.Frame(self.content_frame, padding=8, relief="ridge")
-            item.pack(fill="x", pady=5)
+            if block.type == "heading":
+                preview = block.content
+            else:
+                preview = block.content[:40]
 
-            text = f"{folder_name}  →  {file_name}"
+            if preview:
+                text += f"  →  {preview}"
 
-            if block:
-                preview = ""
+        return text
 
-                if block.get("type") == "heading":
-                    preview = block.get("content", "")
-                else:
-                    preview = block.get("content", "")[:40]
+    def render_result_item(self, parent, result):
+        folder_name, file_name, block = result[:3]
+        item = ttk.Frame(parent, padding=8, relief="ridge")
 
-                if preview:
-                    text += f"  →  {preview}"
+        label = ttk.Label(item, text=self.result_text(result))
+        label.pack(side="left")
 
-            label = ttk.Label(item, text=text)
-            label.pack(side="left")
+        def handler(e, f=folder_name, fi=file_name, b=block):
+            self.open_search_result(f, fi, b)
 
-            def handler(e, f=folder_name, fi=file_name, b=block):
-                self.open_search_result(f, fi, b)
+        item.bind("<Button-1>", handler)
+        for w in item.winfo_children():
+            w.bind("<Button-1>", handler)
 
-            item.bind("<Button-1>", handler)
-            for w in item.winfo_children():
-                w.bind("<Button-1>", handler)
+        return item
 
     def open_search_result(self, folder_name, file_name, block):
         self.current_folder = folder_name
@@ -364,19 +520,27 @@ class NotesApp(
         self.after(100, lambda: self.scroll_to_block(block))
 
     def scroll_to_block(self, target_block):
-        target_heading = target_block.get("heading", "").lower()
-        for frame, text in self.block_widgets:
-            if target_heading and target_heading in text:
-                frame.update_idletasks()
-                canvas = frame.nametowidget(frame.winfo_parent()).master
-                canvas_height = max(1, frame.master.winfo_height())
-                canvas.yview_moveto(frame.winfo_y() / canvas_height)
-                frame.configure(style="Highlight.TFrame")
-                self.after(
-                    1500,
-                    lambda f=frame: f.configure(style="TFrame")
-                )
-                break
+        if self.block_view is None:
+            return
+
+        blocks = self.block_view.blocks
+        index = next((i for i, b in enumerate(blocks) if b is target_block), None)
+        if index is None:
+            # the file was reloaded since the search; fall back to the text
+            target_heading = target_block.content.lower()
+            index = next(
+                (i for i, b in enumerate(blocks) if target_heading and target_heading in b.content.lower()),
+                None
+            )
+        if index is None:
+            return
+
+        frame = self.block_view.scroll_to(index)
+        frame.configure(style="Highlight.TFrame")
+        self.after(
+            1500,
+            lambda f=frame: f.winfo_exists() and f.configure(style="TFrame")
+        )
 
     def update_status(self):
         if self.status_var is not None:
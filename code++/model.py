@@ -0,0 +1,224 @@
+import sys
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from lazy_mapping import LazyMapping
+
+
+# Typed, slotted workspace model. It reads from and writes to the same JSON
+# schema as before ({"meta", "folders": {name: {"created", "files": {...}}}})
+# but costs far less memory than one dict per block.
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_created(created):
+    """Creation time used for ordering; missing or bad values sort as 1970."""
+    try:
+        return datetime.fromisoformat(created)
+    except (TypeError, ValueError):
+        return _EPOCH
+
+
+def _split(obj, known):
+    extra = {k: v for k, v in obj.items() if k not in known}
+    return extra or None
+
+
+class Block:
+    __slots__ = ("type", "content", "created", "extra")
+
+    def __init__(self, block_type, content="", created=None, extra=None):
+        # block types and import timestamps repeat across thousands of blocks
+        self.type = _intern(block_type)
+        self.content = content
+        self.created = _intern(created)
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, obj):
+        return cls(
+            obj.get("type", "text"),
+            obj.get("content", ""),
+            obj.get("created"),
+            _split(obj, ("type", "content", "created"))
+        )
+
+    def to_dict(self):
+        obj = {"type": self.type, "content": self.content}
+        if self.created is not None:
+            obj["created"] = self.created
+        if self.extra:
+            obj.update(self.extra)
+        return obj
+
+
+class BlockList(list):
+    """A file's blocks, in display order."""
+
+    __slots__ = ()
+
+    @staticmethod
+    def adopt(value):
+        return value if isinstance(value, Block) else Block.from_dict(value)
+
+
+class Children(LazyMapping):
+    """
+    Ordered name -> Folder / File container.
+
+    Children can be handed over fully built or loaded lazily; plain JSON
+    dicts assigned through adopt() are converted to the child class.
+
+    A newest-first order by creation time is kept up to date on every
+    insert, rename and delete, so list screens never sort or re-parse
+    timestamps. Ties keep insertion order, as sorted(reverse=True) did.
+    """
+
+    def __init__(self, child_cls, summaries=(), loader=None):
+        super().__init__(summaries, loader, child_cls.summary)
+        self.child_cls = child_cls
+
+        # ascending (created, -seq, name); walked backwards for newest first
+        self._order = []
+        self._order_keys = {}
+        self._seq = 0
+        for name, summary in self._summaries.items():
+            self._place(name, summary["created"])
+
+    def _place(self, name, created):
+        old = self._order_keys.get(name)
+        if old is not None:
+            if old[0] == parse_created(created):
+                return
+            del self._order[bisect_left(self._order, old)]
+            seq = -old[1]
+        else:
+            self._seq += 1
+            seq = self._seq
+
+        key = (parse_created(created), -seq, name)
+        insort(self._order, key)
+        self._order_keys[name] = key
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._place(key, value.created)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        old = self._order_keys.pop(key)
+        del self._order[bisect_left(self._order, old)]
+
+    def by_created(self):
+        """Names, newest first."""
+        for entry in reversed(self._order):
+            yield entry[2]
+
+    @classmethod
+    def from_dict(cls, child_cls, obj):
+        children = cls(child_cls)
+        for name, value in obj.items():
+            children[name] = child_cls.from_dict(value)
+        return children
+
+    def adopt(self, value):
+        if isinstance(value, self.child_cls):
+            return value
+        return self.child_cls.from_dict(value)
+
+    def to_dict(self):
+        return {name: child.to_dict() for name, child in self.items()}
+
+
+class File:
+    __slots__ = ("created", "blocks", "extra")
+
+    def __init__(self, created="", blocks=None, extra=None):
+        self.created = _intern(created)
+        self.blocks = blocks if blocks is not None else BlockList()
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, obj):
+        return cls(
+            obj.get("created", ""),
+            BlockList(Block.from_dict(b) for b in obj.get("blocks", [])),
+            _split(obj, ("created", "blocks"))
+        )
+
+    def to_dict(self):
+        obj = {"created": self.created, "blocks": [b.to_dict() for b in self.blocks]}
+        if self.extra:
+            obj.update(self.extra)
+        return obj
+
+    def summary(self):
+        return {"created": self.created}
+
+
+class Folder:
+    __slots__ = ("created", "files", "extra")
+
+    def __init__(self, created="", files=None, extra=None):
+        self.created = _intern(created)
+        self.files = files if files is not None else Children(File)
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, obj):
+        return cls(
+            obj.get("created", ""),
+            Children.from_dict(File, obj.get("files", {})),
+            _split(obj, ("created", "files"))
+        )
+
+    def attrs(self):
+        """Everything except the files, as stored in the JSON schema."""
+        obj = {"created": self.created}
+        if self.extra:
+            obj.update(self.extra)
+        return obj
+
+    def to_dict(self):
+        obj = self.attrs()
+        obj["files"] = self.files.to_dict()
+        return obj
+
+    def summary(self):
+        return {"created": self.created, "file_count": len(self.files)}
+
+
+class Workspace:
+    __slots__ = ("meta", "folders")
+
+    def __init__(self, meta=None, folders=None):
+        self.meta = meta if meta is not None else {}
+        self.folders = folders if folders is not None else Children(Folder)
+
+    @classmethod
+    def from_dict(cls, obj):
+        return cls(
+            dict(obj.get("meta", {})),
+            Children.from_dict(Folder, obj.get("folders", {}))
+        )
+
+    def to_dict(self):
+        return {"meta": self.meta, "folders": self.folders.to_dict()}
+
+
+def plain(obj):
+    """JSON-schema form of a model object; plain values pass through."""
+    return obj.to_dict() if hasattr(obj, "to_dict") else obj
+
+
+def json_default(obj):
+    """default= hook so json.dumps accepts model objects."""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
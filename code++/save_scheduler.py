@@ -0,0 +1,126 @@
+import threading
+import time
+
+
+# Quiet period after the last edit before anything touches the disk
+SAVE_DELAY = 0.4
+# A failed write is retried after this long, doubling up to RETRY_MAX
+RETRY_DELAY = 1.0
+RETRY_MAX = 30.0
+
+
+class SaveScheduler:
+    """
+    Coalesces bursts of edits into one write on a background thread.
+
+    The UI thread only calls mark_dirty(); after SAVE_DELAY seconds without
+    further edits the worker hands everything collected so far to
+    write(lines, full) in a single call.
+
+    full is a snapshot taken by the UI thread for a whole-workspace write
+    (None if there is none); lines are the changes made after it, to be
+    written once the snapshot is down.
+
+    A write that raises is put back in front of whatever came in since
+    and retried with a growing delay; only the first failure in a row is
+    reported to on_error.
+    """
+
+    def __init__(self, write, on_error=None, delay=SAVE_DELAY):
+        self._write = write
+        self._on_error = on_error
+        self.delay = delay
+
+        self._cond = threading.Condition()
+        self._lines = []
+        self._full = None
+        self._dirty = False
+        self._busy = False
+        self._deadline = 0.0
+        self._closed = False
+        self._retry = 0.0
+        self._failures = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, lines=None, full=None):
+        with self._cond:
+            if full is not None:
+                # the snapshot already contains every pending change
+                self._full = full
+                self._lines = []
+            elif lines:
+                self._lines.extend(lines)
+            self._dirty = True
+            self._deadline = time.monotonic() + self.delay
+            self._cond.notify_all()
+
+    def pending(self):
+        """Whether edits are waiting that the worker has not picked up yet."""
+        with self._cond:
+            return self._dirty
+
+    def flush(self):
+        """
+        Write anything pending right now and wait until it is on disk, or
+        until that write has failed.
+        """
+        with self._cond:
+            failures = self._failures
+            self._deadline = 0.0
+            self._cond.notify_all()
+            while (self._dirty or self._busy) and self._failures == failures:
+                self._cond.wait()
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._dirty:
+                        remaining = self._deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+
+                if self._closed:
+                    return
+
+                lines, full = self._lines, self._full
+                self._lines, self._full = [], None
+                self._dirty = False
+                self._busy = True
+
+            try:
+                self._write(lines, full)
+            except Exception as e:
+                with self._cond:
+                    self._requeue(lines, full)
+                    first = self._retry == 0.0
+                    self._retry = min(RETRY_MAX, self._retry * 2 or RETRY_DELAY)
+                    self._deadline = time.monotonic() + self._retry
+                    self._failures += 1
+                if first and self._on_error:
+                    self._on_error(e)
+            else:
+                self._retry = 0.0
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _requeue(self, lines, full):
+        # with _cond held
+        if self._full is None:
+            # a newer snapshot would already contain the failed batch
+            self._full = full
+            self._lines = lines + self._lines
+        self._dirty = True
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+
+# Screens kept alive (hidden) after leaving them
+SCREEN_CACHE_SIZE = 8
+
+
+def stale_prefixes(change):
+    """Prefixes of the screen keys a change to the model can make stale."""
+    path = change[1]
+    if not path or path[0] != "folders":
+        return []
+
+    prefixes = [("search",)]
+    names = [path[1]] if len(path) > 1 else []
+
+    if len(path) in (2, 4):
+        # a folder or file came, went or was renamed: names and counts
+        prefixes.append(("folders",))
+    if len(path) == 2:
+        if change[0] == "rename":
+            names.append(change[2])
+        for name in names:
+            prefixes += [("files", name), ("file", name)]
+    elif len(path) >= 4:
+        files = [path[3]]
+        if len(path) == 4:
+            prefixes.append(("files", path[1]))
+            if change[0] == "rename":
+                files.append(change[2])
+        prefixes += [("file", path[1], name) for name in files]
+
+    return prefixes
+
+
+class ScreenCache:
+    """
+    Recently left screens, hidden but alive, for instant back navigation.
+
+    put() takes the screen being left (already pack_forget'ed); take()
+    hands it back for packing again. At most size screens are kept, the
+    least recently left one is destroyed first. invalidate(changes)
+    destroys the cached screens showing data those changes touched, so a
+    stale screen is never brought back.
+    """
+
+    def __init__(self, size=SCREEN_CACHE_SIZE):
+        self.size = size
+        self._screens = OrderedDict()  # key -> screen, oldest first
+
+    def put(self, screen):
+        old = self._screens.pop(screen.key, None)
+        if old is not None and old is not screen:
+            old.destroy()
+        self._screens[screen.key] = screen
+
+        while len(self._screens) > self.size:
+            _, evicted = self._screens.popitem(last=False)
+            evicted.destroy()
+
+    def take(self, key):
+        screen = self._screens.pop(key, None)
+        if screen is not None and screen.winfo_exists():
+            return screen
+        return None
+
+    def invalidate(self, changes):
+        prefixes = [p for change in changes for p in stale_prefixes(change)]
+        if not prefixes:
+            return
+
+        for key in list(self._screens):
+            if any(key[:len(p)] == p for p in prefixes):
+                self._screens.pop(key).destroy()
+
+    def clear(self):
+        for screen in self._screens.values():
+            screen.destroy()
+        self._screens.clear()
@@ -0,0 +1,934 @@
+import heapq
+import json
+import math
+import os
+import threading
+import zlib
+from itertools import count
+
+from code_tokenizer import code_tokens
+from search_query import parse_query
+from search_regex import REGEX_BUDGET, RegexHits, RegexMatcher, compile_pattern, required_literals
+
+
+GRAM = 3
+
+# ranked mode: BM25 parameters, per-field weights and page size
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME, HEADING, BODY, CODE = 0, 1, 2, 3
+FIELD_WEIGHTS = (3.0, 2.0, 1.0, 2.0)
+PAGE_SIZE = 50
+# ranked mode: query terms whose index lookups are kept until the next edit
+TERM_CACHE_SIZE = 64
+
+# bump whenever the sidecar layout or the tokenization changes
+INDEX_VERSION = 3
+
+
+def grams(text):
+    """Character trigrams of an already lowercased text."""
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _order(entry):
+    return (entry.folder.seq, entry.seq)
+
+
+def _bits_of(bitset):
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+class _FolderEntry:
+    __slots__ = ("name", "seq", "files", "bits")
+
+    def __init__(self, name, seq):
+        self.name = name
+        self.seq = seq
+        self.files = {}
+        # bitset of the files' bit numbers
+        self.bits = 0
+
+
+class _FileEntry:
+    __slots__ = (
+        "folder", "name", "seq", "bit", "grams", "code_terms", "text_terms", "types", "lengths"
+    )
+
+    def __init__(self, folder, name, seq, bit):
+        self.folder = folder
+        self.name = name
+        self.seq = seq
+        # position in the folder and block-type bitsets
+        self.bit = bit
+        # trigrams of the file name and of all its blocks together
+        # (None after loading from disk until the file is re-indexed)
+        self.grams = frozenset()
+        # code-block token -> occurrences (see code_tokenizer)
+        self.code_terms = {}
+        # whitespace-separated word -> [name, heading, body] occurrences,
+        # so ranking never has to read the file
+        self.text_terms = {}
+        # block types present in the file
+        self.types = frozenset()
+        # characters in the name, heading and body fields and code
+        # tokens, for BM25
+        self.lengths = (0, 0, 0, 0)
+
+
+class RankedCursor:
+    """
+    Scored candidates of one ranked query, handed out a page at a time.
+
+    Candidates are scored from index statistics alone. Each page takes
+    the best remaining ones through a heap of the page size, and only
+    those are checked against the file contents by verify(entry), which
+    returns the hit or None. Nothing else is ever sorted or read.
+
+    Verifying reads files, so page() only runs on the search worker,
+    under the index lock (see SearchIndex.ranked() and more()).
+    """
+
+    def __init__(self, scored, verify):
+        self._scored = scored  # (sort key, entry); keys are unique
+        self._verify = verify
+        self._after = None  # key of the last candidate taken
+        self._ready = []
+
+    def _take(self, n):
+        rest = self._scored
+        if self._after is not None:
+            after = self._after
+            rest = [c for c in rest if c[0] > after]
+            self._scored = rest
+        best = heapq.nsmallest(n, rest, key=lambda c: c[0])
+        if best:
+            self._after = best[-1][0]
+        return best
+
+    def _fill(self, n, cancelled):
+        while len(self._ready) < n:
+            batch = self._take(n - len(self._ready))
+            if not batch:
+                break
+            for _, entry in batch:
+                if cancelled is not None and cancelled():
+                    return False
+                hit = self._verify(entry)
+                if hit is not None:
+                    self._ready.append(hit)
+        return True
+
+    def page(self, size=PAGE_SIZE, cancelled=None):
+        """The next size hits as a RankedPage, or None when cancelled."""
+        # one hit past the page tells whether "Show more" has anything
+        if not self._fill(size + 1, cancelled):
+            return None
+        page = RankedPage(self._ready[:size])
+        self._ready = self._ready[size:]
+        page.more = bool(self._ready)
+        page.cursor = self
+        return page
+
+
+class RankedPage(list):
+    """
+    (folder, file, block) hits of one ranked page, verified on the worker.
+    more tells whether another page follows; cursor fetches it through
+    SearchIndex.more().
+    """
+
+    more = False
+    cursor = None
+
+
+class SearchIndex:
+    """
+    Trigram index over file names and block contents for global search.
+
+    Postings map each lowercase trigram to the files containing it. Any
+    substring query of three or more characters (``ush -u``, ``.venv\\scr``)
+    is narrowed to the files holding all of its trigrams, which are then
+    verified with the plain ``in`` test; shorter queries match nearly
+    everything and simply scan. The index is built on the first search
+    and kept current from the change records passed to save_data,
+    re-indexing only the files those records touch.
+
+    search() returns exactly what the plain scan did: every file whose
+    name contains the query, otherwise its first block whose content
+    contains it, in workspace order.
+
+    Filters (folder:, file:, type:, has:, -word; see search_query) are
+    narrowed first through bitsets of file numbers kept per folder and
+    per block type, before any text is looked at.
+
+    The index itself is only touched under its own lock, by the thread
+    that runs search(), warm() or save(); apply(), reset() and
+    load_from() just queue work for it. Those threads see the workspace
+    through a WorkspaceReader, which reads folders not yet opened on
+    their own instead of loading them into the live model.
+    """
+
+    def __init__(self):
+        self.built = False
+        self._building = False
+        self._folders = {}
+        self._postings = {}
+        self._code_postings = {}
+        self._word_postings = {}
+        self._seq = count()
+        self._field_totals = [0, 0, 0, 0]
+        self._bits = count()
+        self._by_bit = {}
+        self._type_bits = {}
+
+        self._use = threading.RLock()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._stale = False
+        # (name, Folder) pairs to build from instead of the workspace
+        self._source = None
+        # bumped on every change; compared with the one last saved
+        self._version = 0
+        self._saved_version = 0
+        # (filters, text, matching file entries) of the last search
+        self._last = (None, None, [])
+        # (filters, text, candidate file entries) of the last ranked search
+        self._last_ranked = (None, None, [])
+        # term -> (files holding it, indexed words containing it)
+        self._terms = {}
+        # regex matching runs on a process of its own, started when needed
+        self._matcher = RegexMatcher()
+
+    # ---------------- BUILD / UPDATE ----------------
+
+    @property
+    def unsaved(self):
+        """Whether anything changed since the index was last saved or loaded."""
+        return (
+            self._version != self._saved_version
+            or bool(self._pending) or self._stale or self._source is not None
+        )
+
+    def apply(self, changes):
+        """Queue the change records that save_data received (UI thread)."""
+        if not (self.built or self._building or self._source is not None):
+            return
+        with self._lock:
+            self._pending.extend(changes)
+
+    def reset(self):
+        """Forget everything; the next search rebuilds from the workspace."""
+        with self._lock:
+            self._pending = []
+            self._stale = True
+
+    def load_from(self, folders):
+        """
+        Rebuild from folders rather than the live workspace (UI thread).
+
+        folders yields (name, Folder) pairs in workspace order, copied or
+        read apart from the workspace, so building from them on another
+        thread neither loads lazy folders nor races with edits. They are
+        consumed by the next warm() or search; edits made from now on are
+        queued and applied on top.
+        """
+        with self._lock:
+            self._source = folders
+            self._pending = []
+            self._stale = False
+
+    def rebuild(self, reader):
+        self._building = True
+        try:
+            while True:
+                with self._lock:
+                    # edits queued before this point are already in the tree
+                    self._pending = []
+                    self._stale = False
+                try:
+                    self._build(
+                        (name, files)
+                        for name, files in ((n, reader.files(n)) for n in reader.names())
+                        if files is not None
+                    )
+                except RuntimeError:
+                    # a folder or file was added or removed mid-walk
+                    continue
+                break
+            self.built = True
+        finally:
+            self._building = False
+
+    def _build(self, folders):
+        self._version += 1
+        self._folders = {}
+        self._postings = {}
+        self._code_postings = {}
+        self._word_postings = {}
+        self._field_totals = [0, 0, 0, 0]
+        self._bits = count()
+        self._by_bit = {}
+        self._type_bits = {}
+        for folder_name, files in folders:
+            self._add_folder(folder_name, files)
+
+    def warm(self, reader):
+        """Bring the index up to date now (meant for a background thread)."""
+        with self._use:
+            self._catch_up(reader)
+
+    def _catch_up(self, reader):
+        with self._lock:
+            # _building before _source is dropped: apply() never sees neither
+            if self._source is not None:
+                self._building = True
+            source, self._source = self._source, None
+            pending, self._pending = self._pending, []
+            stale = self._stale
+
+        if pending or stale or source is not None:
+            self._forget_queries()
+            self._version += 1
+
+        if source is not None:
+            try:
+                # a reset() since load_from() makes the copy worthless
+                if not stale:
+                    self._build((name, folder.files.items()) for name, folder in source)
+                    self.built = True
+            except Exception:
+                # the copy could not be read (e.g. rewritten meanwhile)
+                stale = True
+            finally:
+                self._building = False
+
+        if stale or not self.built:
+            self.rebuild(reader)
+        else:
+            self._apply_changes(reader, pending)
+
+    def _forget_queries(self):
+        self._last = (None, None, [])
+        self._last_ranked = (None, None, [])
+        self._terms = {}
+
+    def _add_folder(self, folder_name, files):
+        entry = _FolderEntry(folder_name, next(self._seq))
+        self._folders[folder_name] = entry
+        for file_name, file in files:
+            self._index_file(entry, file_name, file)
+
+    def _drop_folder(self, folder_name):
+        entry = self._folders.pop(folder_name, None)
+        if entry is not None:
+            for file_entry in entry.files.values():
+                self._unpost(file_entry)
+                del self._by_bit[file_entry.bit]
+        return entry
+
+    def _add_file(self, folder_entry, file_name):
+        entry = _FileEntry(folder_entry, file_name, next(self._seq), next(self._bits))
+        folder_entry.files[file_name] = entry
+        folder_entry.bits |= 1 << entry.bit
+        self._by_bit[entry.bit] = entry
+        return entry
+
+    def _remove_file(self, folder_entry, file_name):
+        entry = folder_entry.files.pop(file_name, None)
+        if entry is not None:
+            self._unpost(entry)
+            folder_entry.bits &= ~(1 << entry.bit)
+            del self._by_bit[entry.bit]
+
+    def _index_file(self, folder_entry, file_name, file):
+        entry = folder_entry.files.get(file_name)
+        if entry is None:
+            entry = self._add_file(folder_entry, file_name)
+        else:
+            self._unpost(entry)
+
+        # one pass over the joined text; grams spanning two blocks only
+        # add candidates, which verification throws away
+        text = "\n".join(block.content for block in file.blocks)
+        entry.grams = frozenset(grams(file_name.lower()) | grams(text.lower()))
+
+        code_terms = {}
+        for block in file.blocks:
+            if block.type == "code":
+                for token in code_tokens(block.content):
+                    code_terms[token] = code_terms.get(token, 0) + 1
+        entry.code_terms = code_terms
+
+        text_terms = {}
+        fields = [(NAME, file_name)]
+        fields += [(HEADING if b.type == "heading" else BODY, b.content) for b in file.blocks]
+        for field, content in fields:
+            for word in content.lower().split():
+                counts = text_terms.get(word)
+                if counts is None:
+                    counts = text_terms[word] = [0, 0, 0]
+                counts[field] += 1
+        entry.text_terms = text_terms
+
+        entry.types = frozenset(block.type for block in file.blocks)
+        for block_type in entry.types:
+            self._type_bits[block_type] = self._type_bits.get(block_type, 0) | (1 << entry.bit)
+
+        heading = sum(len(b.content) for b in file.blocks if b.type == "heading")
+        entry.lengths = (
+            len(file_name), heading, len(text) - heading, sum(code_terms.values())
+        )
+        for field, length in enumerate(entry.lengths):
+            self._field_totals[field] += length
+
+        for postings, keys in (
+            (self._postings, entry.grams),
+            (self._code_postings, code_terms),
+            (self._word_postings, text_terms)
+        ):
+            for key in keys:
+                files = postings.get(key)
+                if files is None:
+                    postings[key] = {entry}
+                else:
+                    files.add(entry)
+
+    def _unpost(self, entry):
+        if entry.grams is None:
+            # loaded from disk without per-file grams; sweep every posting
+            entry.grams = [g for g, files in self._postings.items() if entry in files]
+
+        for postings, keys in (
+            (self._postings, entry.grams),
+            (self._code_postings, entry.code_terms),
+            (self._word_postings, entry.text_terms)
+        ):
+            for key in keys:
+                files = postings.get(key)
+                if files is not None:
+                    files.discard(entry)
+                    if not files:
+                        del postings[key]
+        entry.grams = frozenset()
+        entry.code_terms = {}
+        entry.text_terms = {}
+
+        for block_type in entry.types:
+            self._type_bits[block_type] &= ~(1 << entry.bit)
+        entry.types = frozenset()
+
+        for field, length in enumerate(entry.lengths):
+            self._field_totals[field] -= length
+        entry.lengths = (0, 0, 0, 0)
+
+    def _apply_changes(self, reader, changes):
+        # records may lag behind the tree; a name that no longer exists is
+        # skipped, since a later record (or none at all) covers it
+        for change in changes:
+            op, path = change[0], change[1]
+            if not path or path[0] != "folders" or len(path) < 2:
+                continue
+            folder_name = path[1]
+
+            if len(path) <= 3:
+                old = self._drop_folder(folder_name)
+                if op == "delete":
+                    continue
+                if op == "rename":
+                    # the model pops and re-inserts, which moves it to the end
+                    folder_name = change[2]
+                    self._drop_folder(folder_name)
+                    old = None
+                files = reader.files(folder_name)
+                if files is not None:
+                    self._add_folder(folder_name, files)
+                    if old is not None:
+                        self._folders[folder_name].seq = old.seq
+                continue
+
+            folder_entry = self._folders.get(folder_name)
+            if folder_entry is None:
+                files = reader.files(folder_name)
+                if files is not None:
+                    self._add_folder(folder_name, files)
+                continue
+
+            file_name = path[3]
+            if len(path) == 4 and op in ("delete", "rename"):
+                self._remove_file(folder_entry, file_name)
+                if op == "delete":
+                    continue
+                file_name = change[2]
+
+            file = reader.file(folder_name, file_name)
+            if file is not None:
+                self._index_file(folder_entry, file_name, file)
+            else:
+                self._remove_file(folder_entry, file_name)
+
+    # ---------------- QUERY ----------------
+
+    def search(self, reader, query, cancelled=None):
+        """
+        query must already be stripped and lowercased. Returns None as soon
+        as cancelled() turns true.
+        """
+        with self._use:
+            matches = self._matches(reader, parse_query(query), cancelled)
+        if matches is None:
+            return None
+
+        return [
+            (entry.folder.name, entry.name, None if name_match else first)
+            for entry, _, name_match, first in matches
+        ]
+
+    def ranked(self, reader, query, cancelled=None):
+        """
+        Same matches as search(), scored BM25-style instead of listed in
+        workspace order. Each query word is a term; its occurrences in
+        the words of the file name, headings and remaining blocks, and
+        in the code-token field, are weighted by FIELD_WEIGHTS.
+
+        Files whose code blocks hold every term as a code token match
+        too, so "get user" finds getUserById. Scores come from the
+        index alone; a file is read only once its hit is about to be
+        shown (see RankedCursor). Returns the first RankedPage, or None
+        when cancelled.
+        """
+        with self._use:
+            self._catch_up(reader)
+            cursor = self._ranked(reader, parse_query(query), cancelled)
+            return cursor.page(cancelled=cancelled) if cursor is not None else None
+
+    def more(self, cursor, cancelled=None):
+        """The RankedPage after the last one cursor gave; None when cancelled."""
+        with self._use:
+            return cursor.page(cancelled=cancelled)
+
+    def _ranked(self, reader, query, cancelled):
+        text = query.text
+        terms = set(text.split())
+        allowed = self._allowed(query)
+
+        # typing on: files holding the new text held the previous one too
+        last_filters, last_text, last_entries = self._last_ranked
+        if (
+            last_text is not None and len(last_text) >= GRAM
+            and last_filters == query.filters() and last_text in text
+        ):
+            added = [self._postings.get(g, ()) for g in grams(text) - grams(last_text)]
+            entries = [e for e in last_entries if all(e in files for files in added)]
+        else:
+            entries = self._entries(query, allowed)
+        self._last_ranked = (query.filters(), text, list(entries))
+
+        code_matches = set()
+        if not query.types or "code" in query.types:
+            listed = set(entries)
+            for entry in self._code_candidates(terms):
+                if allowed is None or allowed >> entry.bit & 1:
+                    code_matches.add(entry)
+                    if entry not in listed:
+                        entries.append(entry)
+
+        file_count = sum(len(f.files) for f in self._folders.values()) or 1
+        averages = [max(total / file_count, 1.0) for total in self._field_totals]
+
+        def idf(df):
+            return math.log(1 + (file_count - df + 0.5) / (df + 0.5))
+
+        text_idf = {}
+        code_idf = {}
+        words = {}
+        for term in terms:
+            df, words[term] = self._term(term)
+            text_idf[term] = idf(df if df is not None else file_count)
+            code_idf[term] = idf(len(self._code_postings.get(term, ())))
+
+        def bm25(tf, length, field, weight):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / averages[field])
+            return FIELD_WEIGHTS[field] * weight * tf * (BM25_K1 + 1) / (tf + norm)
+
+        scored = []
+        for entry in entries:
+            if cancelled is not None and cancelled():
+                return None
+
+            score = 0.0
+            text_terms = entry.text_terms
+            for term, weight in text_idf.items():
+                found = words[term]
+                if len(found) < len(text_terms):
+                    counts = [text_terms[w] for w in found if w in text_terms]
+                else:
+                    counts = [c for w, c in text_terms.items() if w in found]
+
+                for field in (NAME, HEADING, BODY):
+                    tf = sum(c[field] for c in counts)
+                    if tf:
+                        score += bm25(tf, entry.lengths[field], field, weight)
+
+                tf = entry.code_terms.get(term, 0)
+                if tf:
+                    score += bm25(tf, entry.lengths[CODE], CODE, code_idf[term])
+
+            # best score first; ties keep workspace order
+            scored.append(((-score, _order(entry)), entry))
+
+        def verify(entry):
+            file = self._file(reader, entry)
+            if file is None or self._excluded(query, entry, file):
+                return None
+
+            found = self._match(query, entry, file)
+            if found is not None:
+                name_match, first = found
+                return (entry.folder.name, entry.name, None if name_match else first)
+
+            if entry in code_matches:
+                for block in file.blocks:
+                    if block.type == "code" and not terms.isdisjoint(code_tokens(block.content)):
+                        return (entry.folder.name, entry.name, block)
+            return None
+
+        return RankedCursor(scored, verify)
+
+    def regex_search(self, reader, pattern, cancelled=None, budget=REGEX_BUDGET):
+        """
+        Files whose name, or else some block, matches the regular
+        expression pattern (case-insensitive), in workspace order, with
+        the span of the first match. Literal runs the pattern requires
+        narrow the files through the trigram postings first.
+
+        Matching runs on the RegexMatcher process and stops after budget
+        seconds with what it found (hits.truncated); the clock is checked
+        between blocks and between the windows of a long block, so no
+        single match attempt sees more than REGEX_WINDOW characters, and
+        the process is killed if one still runs away. Raises re.error
+        for an invalid or too costly pattern (see compile_pattern); None
+        when cancelled.
+        """
+        compile_pattern(pattern)
+
+        # only the candidate list needs the index; matching runs unlocked
+        with self._use:
+            self._catch_up(reader)
+
+            literals = [lit for lit in required_literals(pattern) if len(lit) >= GRAM]
+            if literals:
+                entries = self._candidates(set().union(*(grams(lit) for lit in literals)))
+            else:
+                entries = sorted(
+                    (e for f in self._folders.values() for e in f.files.values()),
+                    key=_order
+                )
+            names = [(entry.folder.name, entry.name) for entry in entries]
+
+        files = []
+        texts = []
+        for folder_name, file_name in names:
+            if cancelled is not None and cancelled():
+                return None
+            file = reader.file(folder_name, file_name)
+            if file is not None:
+                files.append((folder_name, file_name, file.blocks))
+                texts.append([file_name] + [block.content for block in file.blocks])
+
+        result = self._matcher.match(pattern, texts, budget, cancelled)
+        if result is None:
+            return None
+
+        found, truncated = result
+        hits = RegexHits()
+        for i, j, span in found:
+            folder_name, file_name, blocks = files[i]
+            hits.append((folder_name, file_name, blocks[j - 1] if j else None, span))
+        hits.truncated = truncated
+        return hits
+
+    def _term(self, term):
+        """
+        (number of files holding term, or None if it is too short to
+        tell; indexed words containing it, as text.count(term) would find
+        it). Kept until the next edit; a term typed on from a known one
+        is looked for among that one's words only.
+        """
+        found = self._terms.get(term)
+        if found is not None:
+            return found
+
+        df = len(self._candidates(grams(term))) if len(term) >= GRAM else None
+        known = [t for t in self._terms if t in term]
+        vocabulary = self._terms[max(known, key=len)][1] if known else self._word_postings
+        found = (df, {word for word in vocabulary if term in word})
+
+        if len(self._terms) >= TERM_CACHE_SIZE:
+            self._terms.clear()
+        self._terms[term] = found
+        return found
+
+    def _code_candidates(self, terms):
+        """Files whose code blocks contain every term as a code token."""
+        postings = []
+        for term in terms:
+            files = self._code_postings.get(term)
+            if not files:
+                return []
+            postings.append(files)
+        if not postings:
+            return []
+        postings.sort(key=len)
+
+        files = set(postings[0])
+        for more in postings[1:]:
+            files &= more
+        return sorted(files, key=_order)
+
+    def _allowed(self, query):
+        """Bitset of the files passing query's filters; None if unfiltered."""
+        allowed = None
+
+        if query.folders:
+            allowed = 0
+            for folder_entry in self._folders.values():
+                name = folder_entry.name.lower()
+                if any(value in name for value in query.folders):
+                    allowed |= folder_entry.bits
+
+        if query.types:
+            bits = 0
+            for block_type in query.types:
+                bits |= self._type_bits.get(block_type, 0)
+            allowed = bits if allowed is None else allowed & bits
+
+        for block_type in query.has:
+            bits = self._type_bits.get(block_type, 0)
+            allowed = bits if allowed is None else allowed & bits
+
+        if query.files:
+            if allowed is None:
+                entries = (e for f in self._folders.values() for e in f.files.values())
+            else:
+                entries = (self._by_bit[bit] for bit in _bits_of(allowed))
+            allowed = 0
+            for entry in entries:
+                name = entry.name.lower()
+                if any(value in name for value in query.files):
+                    allowed |= 1 << entry.bit
+
+        return allowed
+
+    def _file(self, reader, entry):
+        return reader.file(entry.folder.name, entry.name)
+
+    def _excluded(self, query, entry, file):
+        if not query.exclude:
+            return False
+        name = entry.name.lower()
+        for word in query.exclude:
+            if word in name or any(word in block.content.lower() for block in file.blocks):
+                return True
+        return False
+
+    def _matches(self, reader, query, cancelled):
+        """
+        (entry, file, name matched, first matching block) for every file
+        matching query, in workspace order; None when cancelled.
+
+        Files matching a query also match every substring of it, so when
+        the new text contains the previous one (typing on) under the same
+        filters, only the previous matches are checked again. Any edit
+        drops that cache.
+        """
+        self._catch_up(reader)
+        text = query.text
+
+        last_filters, last_text, last_entries = self._last
+        if last_text is not None and last_filters == query.filters() and last_text in text:
+            entries = last_entries
+        else:
+            entries = self._entries(query, self._allowed(query))
+
+        matches = []
+        for entry in entries:
+            if cancelled is not None and cancelled():
+                return None
+
+            file = self._file(reader, entry)
+            if file is None or self._excluded(query, entry, file):
+                continue
+
+            found = self._match(query, entry, file)
+            if found is not None:
+                matches.append((entry, file) + found)
+
+        self._last = (query.filters(), text, [m[0] for m in matches])
+        return matches
+
+    def _entries(self, query, allowed):
+        """Files that may match query, from the index alone, in workspace order."""
+        text = query.text
+        if len(text) >= GRAM:
+            entries = self._candidates(grams(text))
+            if allowed is not None:
+                entries = [e for e in entries if allowed >> e.bit & 1]
+            return entries
+        if allowed is not None:
+            return sorted((self._by_bit[bit] for bit in _bits_of(allowed)), key=_order)
+        # too short to narrow by trigrams; nearly everything matches
+        return sorted(
+            (e for f in self._folders.values() for e in f.files.values()),
+            key=_order
+        )
+
+    def _match(self, query, entry, file):
+        """(name matched, first matching block) if file matches query's text."""
+        text = query.text
+        types = query.types
+
+        # with type: only blocks of those types count, not the name
+        if not types and text in entry.name.lower():
+            return True, None
+
+        for block in file.blocks:
+            if (not types or block.type in types) and text in block.content.lower():
+                return False, block
+        return None
+
+    def _candidates(self, query_grams):
+        """Files holding every query trigram, in workspace order."""
+        postings = []
+        for gram in query_grams:
+            files = self._postings.get(gram)
+            if not files:
+                return []
+            postings.append(files)
+        postings.sort(key=len)
+
+        files = set(postings[0])
+        for more in postings[1:]:
+            files &= more
+            if not files:
+                return []
+        return sorted(files, key=_order)
+
+    # ---------------- SIDECAR FILE ----------------
+
+    def save(self, path, reader, fingerprint, timeout=-1):
+        """
+        Write the index next to the workspace, tagged with fingerprint(),
+        a description of the data on disk taken once queued edits are
+        applied. Nothing is written when the index is unchanged since it
+        was last saved or loaded, when fingerprint() returns None, or when
+        the index stays busy for timeout seconds (0: don't wait at all).
+        Returns whether it was written.
+        """
+        if not self._use.acquire(timeout=timeout):
+            return False
+        try:
+            self._catch_up(reader)
+            if self._version == self._saved_version:
+                return False
+            tag = fingerprint()
+            if tag is None:
+                return False
+            version = self._version
+
+            ids = {}
+            folders = []
+            for folder in sorted(self._folders.values(), key=lambda f: f.seq):
+                files = []
+                for entry in sorted(folder.files.values(), key=_order):
+                    ids[entry] = len(ids)
+                    files.append([
+                        entry.name,
+                        list(entry.lengths),
+                        entry.code_terms,
+                        entry.text_terms,
+                        sorted(entry.types)
+                    ])
+                folders.append([folder.name, files])
+
+            payload = {
+                "version": INDEX_VERSION,
+                "fingerprint": tag,
+                "folders": folders,
+                "postings": {
+                    gram: [ids[entry] for entry in files]
+                    for gram, files in self._postings.items()
+                }
+            }
+        finally:
+            self._use.release()
+
+        raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(zlib.compress(raw.encode("utf-8"), 1))
+        os.replace(tmp, path)
+        self._saved_version = version
+        return True
+
+    def load(self, path, reader, fingerprint):
+        """Adopt a saved index if it matches fingerprint; False otherwise."""
+        try:
+            with open(path, "rb") as f:
+                payload = json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            return False
+
+        if payload.get("version") != INDEX_VERSION or payload.get("fingerprint") != fingerprint:
+            return False
+
+        with self._use:
+            entries = []
+            self._folders = {}
+            self._field_totals = [0, 0, 0, 0]
+            self._bits = count()
+            self._by_bit = {}
+            self._type_bits = {}
+            for folder_name, files in payload["folders"]:
+                folder_entry = _FolderEntry(folder_name, next(self._seq))
+                self._folders[folder_name] = folder_entry
+                for file_name, lengths, code_terms, text_terms, types in files:
+                    entry = self._add_file(folder_entry, file_name)
+                    entry.grams = None
+                    entry.code_terms = code_terms
+                    entry.text_terms = text_terms
+                    entry.types = frozenset(types)
+                    for block_type in types:
+                        self._type_bits[block_type] = (
+                            self._type_bits.get(block_type, 0) | (1 << entry.bit)
+                        )
+                    entry.lengths = tuple(lengths)
+                    for field, length in enumerate(lengths):
+                        self._field_totals[field] += length
+                    entries.append(entry)
+
+            self._postings = {
+                gram: {entries[i] for i in ids}
+                for gram, ids in payload["postings"].items()
+            }
+            self._code_postings = {}
+            self._word_postings = {}
+            for entry in entries:
+                for term in entry.code_terms:
+                    self._code_postings.setdefault(term, set()).add(entry)
+                for word in entry.text_terms:
+                    self._word_postings.setdefault(word, set()).add(entry)
+
+            # folders follow the order the backend loaded them in
+            for folder_name in reader.names():
+                folder_entry = self._folders.get(folder_name)
+                if folder_entry is not None:
+                    folder_entry.seq = next(self._seq)
+
+            self._forget_queries()
+            self._saved_version = self._version
+            self.built = True
+        return True
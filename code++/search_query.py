@@ -0,0 +1,96 @@
+FIELDS = ("folder", "file", "type", "has")
+BLOCK_TYPES = ("heading", "text", "code", "link", "image")
+# fields that are only filters with one of these values ("type:string" is text)
+KNOWN_VALUES = {"type": BLOCK_TYPES, "has": BLOCK_TYPES}
+
+
+class Query:
+    """
+    A global-search query split into free text and filters.
+
+    folder:, file: and type: values are alternatives (any may match),
+    every has:<type> must hold, and -word drops files that contain word
+    anywhere. The remaining words, joined by single spaces, are matched
+    as one substring exactly as before. A token in double quotes
+    ("file:path", "-u") is always one of those words.
+    """
+
+    __slots__ = ("text", "folders", "files", "types", "has", "exclude")
+
+    def __init__(self, text, folders=(), files=(), types=(), has=(), exclude=()):
+        self.text = text
+        self.folders = tuple(folders)
+        self.files = tuple(files)
+        self.types = tuple(types)
+        self.has = tuple(has)
+        self.exclude = tuple(exclude)
+
+    @property
+    def structured(self):
+        return bool(self.folders or self.files or self.types or self.has or self.exclude)
+
+    def filters(self):
+        """Everything but the free text; equal filters can share cached matches."""
+        return (self.folders, self.files, self.types, self.has, self.exclude)
+
+
+def _field(token):
+    name, sep, value = token.partition(":")
+    if not (sep and value and name in FIELDS):
+        return None
+    known = KNOWN_VALUES.get(name)
+    if known is not None and value not in known:
+        return None
+    return name, value
+
+
+def _escaped(token):
+    """The text of a quoted token that would otherwise be a filter or -word."""
+    if len(token) > 2 and token[0] == token[-1] == '"':
+        inner = token[1:-1]
+        if _field(inner) or (inner.startswith("-") and len(inner) > 1):
+            return inner
+    return None
+
+
+def parse_query(query):
+    """
+    Parse an already stripped and lowercased query.
+
+    Queries without any field filter are left untouched, so "ush -u" is
+    still one literal substring; only next to a filter does -word mean
+    "exclude". Quotes around a token that looks like a filter or -word
+    only mark it as text and are dropped.
+    """
+    tokens = query.split()
+    if not any(_field(token) for token in tokens):
+        if not any(_escaped(token) for token in tokens):
+            return Query(query)
+        return Query(" ".join(_escaped(token) or token for token in tokens))
+
+    words = []
+    found = {name: [] for name in FIELDS}
+    exclude = []
+
+    for token in tokens:
+        literal = _escaped(token)
+        if literal is not None:
+            words.append(literal)
+            continue
+
+        field = _field(token)
+        if field is not None:
+            found[field[0]].append(field[1])
+        elif token.startswith("-") and len(token) > 1:
+            exclude.append(token[1:])
+        else:
+            words.append(token)
+
+    return Query(
+        " ".join(words),
+        folders=found["folder"],
+        files=found["file"],
+        types=found["type"],
+        has=found["has"],
+        exclude=exclude
+    )
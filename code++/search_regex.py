@@ -0,0 +1,418 @@
+import multiprocessing
+import re
+import threading
+import time
+from functools import lru_cache
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+
+# Stop looking for more matches after this long; results so far are shown
+REGEX_BUDGET = 0.5
+# A matcher process still busy this long after the budget (one match
+# attempt that overran) is killed, and the search keeps what it found
+REGEX_GRACE = 0.5
+# how often the waiting search checks whether it was cancelled
+REGEX_POLL = 0.05
+# A single match attempt never sees more than this many characters of a
+# block; longer ones are searched window by window (overlapping a little,
+# for matches across a window edge), with the budget checked in between
+REGEX_WINDOW = 10000
+REGEX_OVERLAP = 500
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+# these never backtrack into what they matched (Python 3.11+)
+_POSSESSIVE = getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+_ATOMIC = getattr(sre_parse, "ATOMIC_GROUP", None)
+
+# characters tried when checking whether two parts of a pattern can
+# match the same one; the pattern's own characters are added to these
+_SAMPLE = frozenset(map(chr, range(256))) | frozenset("\u0131\u0130\u017f\u2028\u0663\u4e2d")
+_CATEGORIES = {"DIGIT": r"\d", "SPACE": r"\s", "WORD": r"\w", "LINEBREAK": r"\n"}
+
+# ignore-case also matches ı, İ and ſ here, which lower() never produces
+_FOLDED = "is"
+
+
+def _category(name):
+    # CATEGORY_DIGIT, CATEGORY_NOT_WORD, CATEGORY_UNI_SPACE, ...
+    name = str(name)
+    test = re.compile(_CATEGORIES[name.rsplit("_", 1)[1]]).match
+    negated = "_NOT_" in name
+    return lambda ch: bool(test(ch)) != negated
+
+
+def _in(items):
+    negated = False
+    tests = []
+    for op, value in items:
+        if op == sre_parse.NEGATE:
+            negated = True
+        elif op == sre_parse.LITERAL:
+            tests.append(lambda ch, c=chr(value): ch == c)
+        elif op == sre_parse.RANGE:
+            tests.append(lambda ch, lo=value[0], hi=value[1]: lo <= ord(ch) <= hi)
+        elif op == sre_parse.CATEGORY:
+            tests.append(_category(value))
+    return lambda ch: any(test(ch) for test in tests) != negated
+
+
+def _first(items):
+    """(tests for a character items can start with, whether they can match nothing)."""
+    tests = []
+    for op, value in items:
+        if op == sre_parse.LITERAL:
+            tests.append(lambda ch, c=chr(value): ch == c)
+            return tests, False
+        if op == sre_parse.NOT_LITERAL:
+            tests.append(lambda ch, c=chr(value): ch != c)
+            return tests, False
+        if op == sre_parse.ANY:
+            tests.append(lambda ch: True)
+            return tests, False
+        if op == sre_parse.IN:
+            tests.append(_in(value))
+            return tests, False
+
+        if op == sre_parse.SUBPATTERN:
+            found, empty = _first(value[-1])
+        elif op in _REPEATS or op == _POSSESSIVE:
+            low, _, sub = value
+            found, empty = _first(sub)
+            empty = empty or low == 0
+        elif op == _ATOMIC:
+            found, empty = _first(value)
+        elif op == sre_parse.BRANCH or op == sre_parse.GROUPREF_EXISTS:
+            alternatives = value[1] if op == sre_parse.BRANCH else value[1:]
+            found, empty = [], False
+            for alternative in alternatives:
+                more, can_skip = _first(alternative or [])
+                found += more
+                empty = empty or can_skip
+        elif op == sre_parse.GROUPREF:
+            found, empty = [lambda ch: True], True
+        else:
+            # anchors and lookarounds match no characters
+            found, empty = [], True
+
+        tests += found
+        if not empty:
+            return tests, False
+    return tests, True
+
+
+def _overlap(tests, others, chars):
+    """Whether some character (in either case) passes one of tests and one of others."""
+    if not tests or not others:
+        return False
+    for ch in chars:
+        forms = {f for f in (ch, ch.lower(), ch.upper()) if len(f) == 1}
+        if any(t(f) for t in tests for f in forms) and any(t(f) for t in others for f in forms):
+            return True
+    return False
+
+
+def _ambiguous(items, follow, repeated, chars):
+    """
+    Whether items, inside an unbounded repeat (repeated), can match the
+    same text in several ways, which backtracking then tries all of:
+    an unbounded repeat whose characters can also start what follows
+    it, as in (a+)+ or (\\w+\\s?)+, or alternatives that can start
+    alike, as in (a|a)*. follow tests what may come after items. Runs
+    like (\\w+\\.)+ or (\\d{1,3}\\.){3} split only one way and pass.
+    """
+    for i, (op, value) in enumerate(items):
+        rest, empty = _first(items[i + 1:])
+        after = rest + follow if empty else rest
+
+        if op == _ATOMIC or op == _POSSESSIVE:
+            # never backtracked into from outside, but may be inside
+            inner = value if op == _ATOMIC else [(sre_parse.MAX_REPEAT, value)]
+            if _ambiguous(inner, [], False, chars):
+                return True
+        elif op in _REPEATS:
+            _, high, sub = value
+            inner, _ = _first(sub)
+            unbounded = high == sre_parse.MAXREPEAT
+            if repeated and unbounded and _overlap(inner, after, chars):
+                return True
+            if _ambiguous(sub, inner + after if high > 1 else after, repeated or unbounded, chars):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _ambiguous(value[-1], after, repeated, chars):
+                return True
+        elif op == sre_parse.ASSERT or op == sre_parse.ASSERT_NOT:
+            # a lookaround is matched on its own, from each position
+            if _ambiguous(value[1], [], False, chars):
+                return True
+        elif op == sre_parse.BRANCH or op == sre_parse.GROUPREF_EXISTS:
+            alternatives = [a or [] for a in (value[1] if op == sre_parse.BRANCH else value[1:])]
+            starts = []
+            for alternative in alternatives:
+                tests, can_skip = _first(alternative)
+                starts.append(tests + after if can_skip else tests)
+            if repeated and any(
+                _overlap(starts[j], starts[k], chars)
+                for j in range(len(starts)) for k in range(j + 1, len(starts))
+            ):
+                return True
+            if any(_ambiguous(a, after, repeated, chars) for a in alternatives):
+                return True
+    return False
+
+
+@lru_cache(maxsize=64)
+def compile_pattern(pattern):
+    """
+    Compiled, case-insensitive pattern; raises re.error when invalid.
+
+    A match attempt cannot be interrupted, so patterns that can match
+    the same text in many ways under an unbounded repeat, which can
+    backtrack for minutes on a short line, are refused as well.
+    """
+    compiled = re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+    chars = _SAMPLE | set(pattern)
+    if _ambiguous(sre_parse.parse(pattern, compiled.flags), [], False, chars):
+        raise re.error("patterns like (a+)+ or (a|a)* are not supported", pattern)
+    return compiled
+
+
+def windows(text):
+    """(start, end) ranges of text of at most REGEX_WINDOW characters."""
+    start = 0
+    while True:
+        end = min(len(text), start + REGEX_WINDOW)
+        if end < len(text):
+            # end on a line break where possible, so $ is not matched early
+            newline = text.rfind("\n", start + REGEX_WINDOW // 2, end)
+            if newline != -1:
+                end = newline
+        yield start, end
+        if end >= len(text):
+            return
+        start = max(start + 1, end - REGEX_OVERLAP)
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def _serve(conn):
+    """
+    Matcher process: for each (pattern, files, budget) received, send
+    (file index, text index, span) of the first match in each file's
+    texts, then whether the budget ran out. A None received while
+    matching stops the job early (and is ignored otherwise).
+    """
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            continue
+
+        pattern, files, budget = job
+        compiled = compile_pattern(pattern)
+        deadline = time.monotonic() + budget
+        truncated = False
+        try:
+            for i, texts in enumerate(files):
+                for j, text in enumerate(texts):
+                    match = _search(compiled, text, conn, deadline)
+                    if match:
+                        conn.send((i, j, match.span()))
+                        break
+        except _Stopped:
+            pass
+        except _OutOfTime:
+            truncated = True
+        conn.send(truncated)
+
+
+def _search(compiled, text, conn, deadline):
+    for start, end in windows(text):
+        if conn.poll():
+            conn.recv()
+            raise _Stopped
+        if time.monotonic() > deadline:
+            raise _OutOfTime
+        match = compiled.search(text, start, end)
+        if match:
+            return match
+    return None
+
+
+class RegexMatcher:
+    """
+    Runs regex matching on a process of its own.
+
+    re holds the interpreter lock for a whole match attempt, so one
+    that runs away on a thread stalls every other thread, the UI
+    included, and can't be stopped. The process is started on first
+    use and killed (then started again next time) when it overruns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+
+    def match(self, pattern, files, budget=REGEX_BUDGET, cancelled=None):
+        """
+        ([(file index, text index, span)], truncated) for the first match
+        of pattern in each of files (lists of texts); None when
+        cancelled. pattern must have passed compile_pattern().
+        """
+        with self._lock:
+            conn = self._start()
+            conn.send((pattern, files, budget))
+
+            found = []
+            give_up = time.monotonic() + budget + REGEX_GRACE
+            stopping = False
+            try:
+                while True:
+                    if not stopping and cancelled is not None and cancelled():
+                        conn.send(None)
+                        stopping = True
+
+                    wait = give_up - time.monotonic()
+                    if wait <= 0:
+                        self._kill()
+                        return None if stopping else (found, True)
+                    if not conn.poll(min(wait, REGEX_POLL)):
+                        continue
+
+                    message = conn.recv()
+                    if isinstance(message, bool):
+                        return None if stopping else (found, message)
+                    found.append(message)
+            except (EOFError, OSError):
+                # the process died; the next search starts another
+                self._kill()
+                raise
+
+    def _start(self):
+        if self._process is None:
+            # spawn: forking a process that runs threads (Tk, workers) is unsafe
+            context = multiprocessing.get_context("spawn")
+            self._conn, child = context.Pipe()
+            self._process = context.Process(target=_serve, args=(child,), daemon=True)
+            self._process.start()
+            child.close()
+        return self._conn
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._conn.close()
+            self._process = None
+            self._conn = None
+
+
+class RegexHits(list):
+    """(folder, file, block, (start, end)) hits; truncated if the budget ran out."""
+
+    truncated = False
+
+
+def _skip_class(pattern, i):
+    """Index just past the [...] class starting at pattern[i]."""
+    i += 1
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i + 1
+
+
+def required_literals(pattern):
+    """
+    Lowercase literal runs that every match of pattern must contain.
+
+    Deliberately conservative: anything inside groups, classes or under
+    a quantifier is skipped, and a top-level | or verbose mode gives up
+    entirely. "kubectl apply .*--dry-run" yields ["kubectl apply ", "--dry-run"].
+    """
+    if re.match(r"\(\?[a-zA-Z]*x", pattern):
+        return []
+
+    runs = []
+    run = []
+    depth = 0
+    i = 0
+
+    def close():
+        if run:
+            runs.append("".join(run))
+            run.clear()
+
+    while i < len(pattern):
+        c = pattern[i]
+
+        if c == "\\":
+            nxt = pattern[i + 1:i + 2]
+            i += 2
+            if not nxt or nxt.isalnum():
+                # \d \w \b \1 ... are not literals
+                close()
+                continue
+            c = nxt
+        elif c == "[":
+            close()
+            i = _skip_class(pattern, i)
+            continue
+        elif c == "(":
+            close()
+            depth += 1
+            i += 1
+            continue
+        elif c == ")":
+            depth -= 1
+            i += 1
+            continue
+        elif c == "|":
+            if depth == 0:
+                return []
+            i += 1
+            continue
+        elif c in ".^$":
+            close()
+            i += 1
+            continue
+        elif c in "*?{":
+            # the atom before an optional quantifier may be absent
+            if run:
+                run.pop()
+            close()
+            if c == "{":
+                end = pattern.find("}", i)
+                i = end + 1 if end != -1 else len(pattern)
+            else:
+                i += 1
+            continue
+        elif c == "+":
+            close()
+            i += 1
+            continue
+        else:
+            i += 1
+
+        if depth == 0 and c.isascii() and c.lower() not in _FOLDED:
+            run.append(c.lower())
+        else:
+            close()
+
+    close()
+    return runs
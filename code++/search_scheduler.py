@@ -0,0 +1,112 @@
+import threading
+import time
+
+
+# Typing pause before a query is actually run
+SEARCH_DELAY = 0.15
+POLL_MS = 30
+
+
+class SearchScheduler:
+    """
+    Runs only the latest global search, on a background thread.
+
+    submit() is called on every keystroke; the worker waits until typing
+    pauses for SEARCH_DELAY seconds and then calls search(query, cancelled).
+    Every submit (or cancel) bumps a generation number: a running search
+    sees cancelled() turn true and gives up, and results of an outdated
+    generation are never delivered. The newest results are handed to
+    on_done on the Tk thread through an after() poll. Requests that
+    aren't typed (such as "Show more") pass delay=0.
+    """
+
+    def __init__(self, app, search, on_error=None, delay=SEARCH_DELAY):
+        self.app = app
+        self._search = search
+        self._on_error = on_error
+        self.delay = delay
+
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._query = None
+        self._on_done = None
+        self._deadline = 0.0
+        self._result = None
+        self._busy = False
+        self._polling = False
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, query, on_done, delay=None):
+        with self._cond:
+            self._generation += 1
+            self._query = query
+            self._on_done = on_done
+            self._result = None
+            self._deadline = time.monotonic() + (self.delay if delay is None else delay)
+            self._cond.notify_all()
+
+        if not self._polling:
+            self._polling = True
+            self.app.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        with self._cond:
+            self._generation += 1
+            self._query = None
+            self._result = None
+
+    def close(self):
+        with self._cond:
+            self._generation += 1
+            self._closed = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._query is not None:
+                        remaining = self._deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+
+                if self._closed:
+                    return
+
+                generation, query = self._generation, self._query
+                on_done = self._on_done
+                self._query = None
+                self._busy = True
+
+            def cancelled():
+                return generation != self._generation
+
+            try:
+                found = (on_done, self._search(query, cancelled))
+            except Exception as e:
+                found = (self._on_error, e)
+
+            with self._cond:
+                self._busy = False
+                if not cancelled() and found[0] is not None and found[1] is not None:
+                    self._result = (generation,) + found
+
+    def _poll(self):
+        with self._cond:
+            found, self._result = self._result, None
+            waiting = self._query is not None or self._busy
+
+        if found is not None and found[0] == self._generation:
+            _, callback, value = found
+            callback(value)
+
+        if waiting and not self._closed:
+            self.app.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,357 @@
+import json
+import sqlite3
+import threading
+
+from model import Block, BlockList, Children, File, Folder, Workspace, plain
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    folder_id INTEGER NOT NULL REFERENCES folders(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    created TEXT,
+    extra TEXT,
+    UNIQUE (folder_id, name)
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    type TEXT,
+    content TEXT,
+    created TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS assets (
+    block_id INTEGER PRIMARY KEY REFERENCES blocks(id) ON DELETE CASCADE,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS folders_created ON folders (created);
+CREATE INDEX IF NOT EXISTS files_folder_created ON files (folder_id, created);
+CREATE INDEX IF NOT EXISTS blocks_file_position ON blocks (file_id, position);
+CREATE INDEX IF NOT EXISTS assets_path ON assets (path);
+"""
+
+_FOLDER_KEYS = ("created", "files")
+_FILE_KEYS = ("created", "blocks")
+_BLOCK_KEYS = ("type", "content", "created")
+
+
+def _extra(obj, known):
+    rest = {k: v for k, v in obj.items() if k not in known}
+    return json.dumps(rest) if rest else None
+
+
+def _load_extra(extra):
+    return json.loads(extra) if extra else None
+
+
+class SqliteStore:
+    """
+    Workspace kept in SQLite: one row per folder, file and block.
+
+    Reads go through a connection owned by the UI thread and are lazy per
+    folder and per file. Writes arrive as journal-style records from the
+    save worker and touch only the rows they name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._read = self._connect()
+        self._read.executescript(SCHEMA)
+        self._write = None
+        self._write_lock = threading.Lock()
+        # one read connection per worker thread, for read_folder/read_file;
+        # it goes away with its thread
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def last_modified(self):
+        """meta.last_modified as written; safe to call from any thread."""
+        with self._write_lock:
+            row = self._writer().execute(
+                "SELECT value FROM meta WHERE key = 'last_modified'"
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def is_empty(self):
+        row = self._read.execute("SELECT COUNT(*) FROM meta").fetchone()
+        return row[0] == 0
+
+    # ---------------- LAZY READS ----------------
+
+    def load(self):
+        meta = {
+            key: json.loads(value)
+            for key, value in self._read.execute("SELECT key, value FROM meta")
+        }
+
+        rows = self._read.execute(
+            "SELECT f.id, f.name, f.created, COUNT(fi.id) "
+            "FROM folders f LEFT JOIN files fi ON fi.folder_id = f.id "
+            "GROUP BY f.id ORDER BY f.id"
+        )
+        summaries = {
+            name: {"id": folder_id, "created": created or "", "file_count": count}
+            for folder_id, name, created, count in rows
+        }
+        return Workspace(meta, Children(Folder, summaries, self._load_folder))
+
+    def _load_folder(self, name, summary):
+        created, extra = self._read.execute(
+            "SELECT created, extra FROM folders WHERE id = ?", (summary["id"],)
+        ).fetchone()
+
+        rows = self._read.execute(
+            "SELECT id, name, created FROM files WHERE folder_id = ? ORDER BY id",
+            (summary["id"],)
+        )
+        files = Children(
+            File,
+            {name: {"id": file_id, "created": c or ""} for file_id, name, c in rows},
+            self._load_file
+        )
+        return Folder(created or "", files, _load_extra(extra))
+
+    def _load_file(self, name, summary):
+        return self._read_file(self._read, summary["id"])
+
+    @staticmethod
+    def _read_file(conn, file_id):
+        created, extra = conn.execute(
+            "SELECT created, extra FROM files WHERE id = ?", (file_id,)
+        ).fetchone()
+
+        rows = conn.execute(
+            "SELECT type, content, created, extra FROM blocks "
+            "WHERE file_id = ? ORDER BY position",
+            (file_id,)
+        )
+        blocks = BlockList(
+            Block(block_type, content, block_created, _load_extra(block_extra))
+            for block_type, content, block_created, block_extra in rows
+        )
+        return File(created or "", blocks, _load_extra(extra))
+
+    @classmethod
+    def _read_folder(cls, conn, folder_id):
+        created, extra = conn.execute(
+            "SELECT created, extra FROM folders WHERE id = ?", (folder_id,)
+        ).fetchone()
+        rows = conn.execute(
+            "SELECT id, name FROM files WHERE folder_id = ? ORDER BY id",
+            (folder_id,)
+        ).fetchall()
+
+        files = Children(File)
+        for file_id, file_name in rows:
+            files[file_name] = cls._read_file(conn, file_id)
+        return Folder(created or "", files, _load_extra(extra))
+
+    def read_folders(self, summaries):
+        """
+        Yield (name, Folder) for (name, folder summary) pairs, read whole
+        through a connection of the calling thread. Nothing is loaded
+        into the workspace.
+        """
+        conn = self._connect()
+        try:
+            for name, summary in summaries:
+                yield name, self._read_folder(conn, summary["id"])
+        finally:
+            conn.close()
+
+    def _worker_read(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def read_folder(self, name, summary):
+        """A whole folder through the calling thread's own connection."""
+        return self._read_folder(self._worker_read(), summary["id"])
+
+    def read_file(self, name, summary):
+        """A whole file through the calling thread's own connection."""
+        return self._read_file(self._worker_read(), summary["id"])
+
+    # ---------------- WRITES (save worker) ----------------
+
+    def _writer(self):
+        if self._write is None:
+            self._write = self._connect()
+        return self._write
+
+    def apply(self, lines):
+        with self._write_lock:
+            conn = self._writer()
+            with conn:
+                for line in lines:
+                    self._apply_record(conn, json.loads(line))
+
+    def replace_all(self, data):
+        if isinstance(data, Workspace):
+            data = {"meta": data.meta, "folders": data.folders}
+
+        with self._write_lock:
+            conn = self._writer()
+            with conn:
+                conn.execute("DELETE FROM folders")
+                conn.execute("DELETE FROM meta")
+                for key, value in data.get("meta", {}).items():
+                    self._put_meta(conn, key, value)
+                for name, folder in data.get("folders", {}).items():
+                    self._put_folder(conn, name, plain(folder))
+
+    def close(self):
+        for conn in (self._read, self._write):
+            if conn is not None:
+                conn.close()
+
+    def _apply_record(self, conn, record):
+        op, path = record["op"], record["path"]
+        value = record.get("value")
+
+        if path[0] == "meta":
+            if op == "set" and len(path) == 2:
+                self._put_meta(conn, path[1], value)
+            return
+
+        folder = path[1]
+
+        if len(path) == 2:
+            if op == "set":
+                self._put_folder(conn, folder, value)
+            elif op == "delete":
+                conn.execute("DELETE FROM folders WHERE name = ?", (folder,))
+            elif op == "rename":
+                conn.execute(
+                    "UPDATE folders SET name = ? WHERE name = ?",
+                    (record["to"], folder)
+                )
+            return
+
+        folder_id = self._folder_id(conn, folder)
+        file_name = path[3]
+
+        if len(path) == 4:
+            if op == "set":
+                self._put_file(conn, folder_id, file_name, value)
+            elif op == "delete":
+                conn.execute(
+                    "DELETE FROM files WHERE folder_id = ? AND name = ?",
+                    (folder_id, file_name)
+                )
+            elif op == "rename":
+                conn.execute(
+                    "UPDATE files SET name = ? WHERE folder_id = ? AND name = ?",
+                    (record["to"], folder_id, file_name)
+                )
+            return
+
+        file_id = self._file_id(conn, folder_id, file_name)
+        index = path[5]
+        row = conn.execute(
+            "SELECT id FROM blocks WHERE file_id = ? "
+            "ORDER BY position LIMIT 1 OFFSET ?",
+            (file_id, index)
+        ).fetchone()
+
+        if op == "delete":
+            if row:
+                conn.execute("DELETE FROM blocks WHERE id = ?", (row[0],))
+        elif op == "set":
+            if row:
+                self._update_block(conn, row[0], value)
+            else:
+                self._insert_block(conn, file_id, value)
+
+    # ---------------- ROW HELPERS ----------------
+
+    @staticmethod
+    def _put_meta(conn, key, value):
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, json.dumps(value))
+        )
+
+    @staticmethod
+    def _folder_id(conn, name):
+        return conn.execute(
+            "SELECT id FROM folders WHERE name = ?", (name,)
+        ).fetchone()[0]
+
+    @staticmethod
+    def _file_id(conn, folder_id, name):
+        return conn.execute(
+            "SELECT id FROM files WHERE folder_id = ? AND name = ?",
+            (folder_id, name)
+        ).fetchone()[0]
+
+    def _put_folder(self, conn, name, folder):
+        conn.execute("DELETE FROM folders WHERE name = ?", (name,))
+        cur = conn.execute(
+            "INSERT INTO folders (name, created, extra) VALUES (?, ?, ?)",
+            (name, folder.get("created"), _extra(folder, _FOLDER_KEYS))
+        )
+        for file_name, file in folder.get("files", {}).items():
+            self._put_file(conn, cur.lastrowid, file_name, file)
+
+    def _put_file(self, conn, folder_id, name, file):
+        conn.execute(
+            "DELETE FROM files WHERE folder_id = ? AND name = ?", (folder_id, name)
+        )
+        cur = conn.execute(
+            "INSERT INTO files (folder_id, name, created, extra) VALUES (?, ?, ?, ?)",
+            (folder_id, name, file.get("created"), _extra(file, _FILE_KEYS))
+        )
+        for block in file.get("blocks", []):
+            self._insert_block(conn, cur.lastrowid, block)
+
+    def _insert_block(self, conn, file_id, block):
+        position = conn.execute(
+            "SELECT COALESCE(MAX(position), -1) + 1 FROM blocks WHERE file_id = ?",
+            (file_id,)
+        ).fetchone()[0]
+        cur = conn.execute(
+            "INSERT INTO blocks (file_id, position, type, content, created, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (file_id, position, block.get("type"), block.get("content"),
+             block.get("created"), _extra(block, _BLOCK_KEYS))
+        )
+        self._put_asset(conn, cur.lastrowid, block)
+
+    def _update_block(self, conn, block_id, block):
+        conn.execute(
+            "UPDATE blocks SET type = ?, content = ?, created = ?, extra = ? "
+            "WHERE id = ?",
+            (block.get("type"), block.get("content"), block.get("created"),
+             _extra(block, _BLOCK_KEYS), block_id)
+        )
+        self._put_asset(conn, block_id, block)
+
+    @staticmethod
+    def _put_asset(conn, block_id, block):
+        if block.get("type") == "image":
+            conn.execute(
+                "INSERT OR REPLACE INTO assets (block_id, path) VALUES (?, ?)",
+                (block_id, block.get("content"))
+            )
+        else:
+            conn.execute("DELETE FROM assets WHERE block_id = ?", (block_id,))
@@ -0,0 +1,94 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+
+THUMB_SIZE = (500, 300)
+# decoded PhotoImages kept in memory; a 500x300 thumbnail is ~600 KB
+MEMORY_SLOTS = 48
+
+
+class ThumbnailCache:
+    """
+    Pre-scaled image thumbnails, on disk and in a small in-memory LRU.
+
+    Entries are keyed by the source path, its mtime and size, and the
+    target size, so replacing an image on disk simply misses the cache.
+    Rendering the same file again (or after a restart) then skips the
+    full-size PIL decode.
+
+    Thumbnail files are named after their source image, so prune() can
+    drop the ones whose image is gone.
+    """
+
+    def __init__(self, cache_dir, slots=MEMORY_SLOTS):
+        self.dir = cache_dir
+        self.slots = slots
+        self._photos = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path, size=THUMB_SIZE):
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size, tuple(size))
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        # "<source name>.<digest>.png"
+        return os.path.join(self.dir, f"{os.path.basename(key[0])}.{digest}.png")
+
+    def prune(self, sources):
+        """Delete every thumbnail whose source image name is not in sources."""
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return
+
+        for name in names:
+            parts = name.split(".")
+            source = None
+            if len(parts) >= 3 and parts[-1] == "png":
+                source = ".".join(parts[:-2])
+            # files from the old naming or a torn write have no source either
+            if source in sources:
+                continue
+            try:
+                os.remove(os.path.join(self.dir, name))
+            except OSError:
+                pass
+
+    def cached_photo(self, key):
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+        return photo
+
+    def remember(self, key, photo):
+        self._photos[key] = photo
+        self._photos.move_to_end(key)
+        while len(self._photos) > self.slots:
+            self._photos.popitem(last=False)
+
+    def scaled(self, path, key):
+        """Return the thumbnail as a PIL image, from disk or freshly scaled."""
+        from PIL import Image
+
+        thumb_path = self._disk_path(key)
+        try:
+            with Image.open(thumb_path) as img:
+                img.load()
+                return img
+        except (OSError, ValueError):
+            pass
+
+        img = Image.open(path)
+        img.thumbnail(key[3])
+        if img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+            img = img.convert("RGBA")
+
+        tmp = thumb_path + ".tmp"
+        try:
+            img.save(tmp, "PNG", compress_level=1)
+            os.replace(tmp, thumb_path)
+        except OSError:
+            pass
+        return img
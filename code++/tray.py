@@ -66,6 +66,12 @@ class TrayManager:
 
     def exit_app(self):
         self.stop_tray()
+
+        # ✅ Write out any edits still waiting in the save queue
+        self.app.flush_saves()
+        self.app.images.close()
+        self.app.searcher.close()
+        self.app.save_search_index()
         self.app.after(0, self.app.destroy)
 
     def stop_tray(self):
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+
+
+# Folders (or files) read from disk for worker threads, kept for reuse
+READER_CACHE_SIZE = 16
+
+
+class WorkspaceReader:
+    """
+    Read-only access to the workspace for worker threads.
+
+    Folders and files the UI thread has already loaded are used as they
+    are. Anything still lazy is read by the calling thread itself, with
+    read_folder(name, summary) / read_file(name, summary) (the data file's
+    chunks, or the thread's own SQLite connection), and kept in a small
+    LRU; it is never loaded into the workspace. A lazy folder or file has
+    not changed since the workspace was loaded, so the disk agrees with it.
+
+    workspace() returns the current workspace; it is replaced on import.
+    """
+
+    def __init__(self, workspace, read_folder, read_file=None, size=READER_CACHE_SIZE):
+        self.workspace = workspace
+        self._read_folder = read_folder
+        self._read_file = read_file
+        self.size = size
+
+        self._cache = OrderedDict()  # (folder, file or None) -> (summary, Folder / File)
+        self._lock = threading.Lock()
+
+    def names(self):
+        """Folder names in workspace order."""
+        return list(self.workspace().folders)
+
+    def files(self, folder_name):
+        """(name, File) pairs of a folder in order; None if it is gone."""
+        folder = self._folder(folder_name)
+        if folder is None:
+            return None
+
+        files = []
+        for file_name in list(folder.files):
+            file = self._file_in(folder, folder_name, file_name)
+            if file is not None:
+                files.append((file_name, file))
+        return files
+
+    def file(self, folder_name, file_name):
+        """One file, or None if it (or its folder) is gone."""
+        folder = self._folder(folder_name)
+        if folder is None:
+            return None
+        return self._file_in(folder, folder_name, file_name)
+
+    def _folder(self, folder_name):
+        folders = self.workspace().folders
+        try:
+            folder, summary = folders.peek(folder_name)
+            if folder is None:
+                folder = self._read_lazy(
+                    folders, folder_name, (folder_name, None), self._read_folder, summary
+                )
+        except KeyError:
+            return None
+        return folder
+
+    def _file_in(self, folder, folder_name, file_name):
+        try:
+            file, summary = folder.files.peek(file_name)
+            if file is None:
+                file = self._read_lazy(
+                    folder.files, file_name, (folder_name, file_name), self._read_file, summary
+                )
+        except KeyError:
+            return None
+        return file
+
+    def _read_lazy(self, children, name, key, read, summary):
+        try:
+            return self._cached(key, read, summary)
+        except Exception:
+            # the data was rewritten since the peek; a full write loads
+            # everything into the workspace first, so look there again
+            value, _ = children.peek(name)
+            if value is None:
+                raise
+            return value
+
+    def _cached(self, key, read, summary):
+        with self._lock:
+            cached = self._cache.get(key)
+            # a name can come back for a different lazy entry after a
+            # delete and rename; its summary is then another object
+            if cached is not None and cached[0] is summary:
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        # read outside the lock; two threads may both read the same thing
+        value = read(key[1] if key[1] is not None else key[0], summary)
+        with self._lock:
+            self._cache[key] = (summary, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+        return value